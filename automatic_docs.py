@@ -1,12 +1,75 @@
+import time
+STARTUP_T0 = time.perf_counter()
+
 import os
+import sys
 import json
+import queue
+import zipfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Modo em lote (sem interface gráfica): python automatic_docs.py batch ...
+# Despachado antes de importar o tkinter, para rodar em servidores sem Tk/display.
+if __name__ == "__main__" and len(sys.argv) > 1 and sys.argv[1] == "batch":
+    import batch_docs
+    sys.exit(batch_docs.main(sys.argv[2:]))
+
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from docx import Document
-import re
 from datetime import datetime
 
+# O python-docx é importado pelo document_engine apenas na primeira geração
+import document_engine
+
+# Relatório de tempo de inicialização: --startup-report ou AUTOMATIC_DOCS_STARTUP_REPORT=1
+STARTUP_REPORT = "--startup-report" in sys.argv or bool(os.environ.get("AUTOMATIC_DOCS_STARTUP_REPORT"))
+startup_marks = [("importações", time.perf_counter())]
+
+# Tempo de cada etapa por documento gerado (document_engine.StageTimer):
+# --stage-timings ou AUTOMATIC_DOCS_STAGE_TIMINGS=1. A variável de ambiente é
+# herdada pelos processos do pool, que gravam o registro diretamente.
+if "--stage-timings" in sys.argv:
+    os.environ[document_engine.STAGE_TIMINGS_ENV] = "1"
+
+
+def startup_mark(label):
+    """Registra o instante de uma etapa da inicialização"""
+    startup_marks.append((label, time.perf_counter()))
+
+
+def print_startup_report():
+    """Mostra quanto tempo cada etapa da inicialização levou (desde o início do módulo)"""
+    linhas = ["Tempo de inicialização (desde o início de automatic_docs.py):"]
+    previous = STARTUP_T0
+    for label, instant in startup_marks:
+        linhas.append(f"  {label:<32} +{(instant - previous) * 1000:7.1f} ms   total {(instant - STARTUP_T0) * 1000:7.1f} ms")
+        previous = instant
+    report = "\n".join(linhas)
+
+    # No executável --windowed não há console: gravar o relatório em arquivo
+    if sys.stdout is not None:
+        print(report)
+    else:
+        os.makedirs(document_engine.cache_dir(), exist_ok=True)
+        with open(os.path.join(document_engine.cache_dir(), "startup_report.txt"), 'w', encoding='utf-8') as f:
+            f.write(report + "\n")
+
+
+# Acompanhamento da geração: intervalo de leitura da fila de progresso (~60 quadros
+# por segundo) e máximo de mensagens tratadas por leitura
+POLL_INTERVAL_MS = 16
+POLL_BATCH = 20
+
+# Tarefas de geração em andamento por processo do pool (o restante espera para ser enviado)
+MAX_PENDING_PER_WORKER = 4
+
+
 class DocumentFillerApp:
+    # Quantidade de campos exibidos por página no formulário de dados
+    FORM_PAGE_SIZE = 12
+
     def __init__(self, root):
         self.root = root
         self.root.title("Preenchimento Automático de Documentos")
@@ -29,12 +92,75 @@ class DocumentFillerApp:
         self.selected_docs = []
         self.all_fields = {}
         self.field_values = {}
+        self.form_values = {}
+        
+        # Pool de processos mantido entre gerações: cada processo guarda os modelos
+        # já interpretados (document_engine.template_cache)
+        self.executor = None
+        
+        # Conversor PDF (LibreOffice headless) criado na primeira exportação e reutilizado
+        self.pdf_converter = None
+        self.pdf_var = tk.BooleanVar(value=False)
+        # Saída em um único ZIP (documentos gerados em memória, sem arquivos intermediários)
+        self.zip_var = tk.BooleanVar(value=False)
+        # Sem janela modal durante a geração: impede iniciar outra em paralelo
+        self.generating = False
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # Manifesto persistente: na inicialização só relê modelos e configurações alterados
+        self.manifest = document_engine.ModelManifest()
+        
+        # A busca pelo diretório de templates e a leitura dos modelos JSON acontecem
+        # depois que a janela é desenhada (ver discover_models)
+        self.docx_dir = None
+        
+        self.setup_ui()
+        startup_mark("interface montada")
+        
+        # after_idle deixa o Tk desenhar a janela antes da descoberta de modelos
+        self.root.after_idle(lambda: self.root.after(0, self.discover_models))
+    
+    def discover_models(self):
+        """Procura o diretório de templates e carrega os modelos, fora do caminho crítico da inicialização"""
+        startup_mark("janela desenhada")
         
         # Tentar carregar diretório templates automaticamente
         self.docx_dir = self.find_templates_directory()
         
-        self.setup_ui()
+        # Se temos um diretório de templates, já mostrar os modelos
+        if self.docx_dir:
+            self.load_docx_from_dir(self.docx_dir)
+        else:
+            self.docs_placeholder_label.config(
+                text="Nenhum diretório de templates encontrado automaticamente.\nSelecione o diretório manualmente.")
+        
         self.load_json_models()
+        startup_mark("modelos carregados")
+        
+        if STARTUP_REPORT:
+            print_startup_report()
+
+    def get_executor(self):
+        """Cria o pool de processos na primeira geração e o reutiliza nas seguintes"""
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+        return self.executor
+
+    def get_pdf_converter(self):
+        """Inicia o conversor PDF na primeira exportação e o mantém aberto até o fim da sessão"""
+        if self.pdf_converter is None:
+            import pdf_export
+            self.pdf_converter = pdf_export.PdfConverter()
+        return self.pdf_converter
+
+    def on_close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.pdf_converter is not None:
+            # Documentos na fila são descartados; o PDF em andamento é concluído
+            self.pdf_converter.close(cancel=True)
+        document_engine.prune_output_cache()
+        self.root.destroy()
 
     def find_templates_directory(self):
         """Busca por uma pasta 'templates' no diretório atual ou em subdiretórios"""
@@ -45,12 +171,17 @@ class DocumentFillerApp:
         if os.path.exists(templates_dir) and os.path.isdir(templates_dir):
             return templates_dir
         
+        # Reutilizar o diretório encontrado na execução anterior, se ainda existir
+        if self.manifest.templates_dir and os.path.isdir(self.manifest.templates_dir):
+            return self.manifest.templates_dir
+        
         # Verificar em subdiretórios imediatos
         for item in os.listdir(current_dir):
             item_path = os.path.join(current_dir, item)
             if os.path.isdir(item_path):
                 templates_subdir = os.path.join(item_path, "templates")
                 if os.path.exists(templates_subdir) and os.path.isdir(templates_subdir):
+                    self.manifest.remember_templates_dir(templates_subdir)
                     return templates_subdir
         
         # Se não encontrar, retornar None
@@ -87,15 +218,15 @@ class DocumentFillerApp:
         
         # Lista de modelos de documentos disponíveis
         self.doc_vars = {}
-        self.doc_checkboxes = []
+        self.doc_checkboxes = {}
+        self.docs_dir_label = None
+        self.docs_placeholder_label = None
+        self.docs_loaded_dir = None
         
-        # Se temos um diretório de templates, já mostrar os modelos
-        if self.docx_dir:
-            self.load_docx_from_dir(self.docx_dir)
-        else:
-            ttk.Label(self.docs_checkbox_frame, 
-                     text="Nenhum diretório de templates encontrado automaticamente.\nSelecione o diretório manualmente.",
-                     font=("Arial", 10)).pack(pady=10)
+        # Os modelos são listados por discover_models, logo após a janela aparecer
+        self.docs_placeholder_label = ttk.Label(self.docs_checkbox_frame, 
+                 text="Procurando modelos...", font=("Arial", 10))
+        self.docs_placeholder_label.grid(row=0, column=0, columnspan=2, pady=10)
         
         # Botão para avançar
         ttk.Button(self.docs_frame, text="Avançar para Preenchimento", 
@@ -104,6 +235,12 @@ class DocumentFillerApp:
         # Botão para selecionar diretório de modelos .docx
         ttk.Button(self.docs_frame, text="Selecionar Diretório de Modelos", 
                   command=self.select_docx_dir).pack(pady=10)
+        
+        # Monitoramento opcional das pastas de modelos e configurações
+        self.watch_var = tk.BooleanVar(value=False)
+        self.watch_after_id = None
+        ttk.Checkbutton(self.docs_frame, text="Atualizar automaticamente ao adicionar modelos na pasta",
+                        variable=self.watch_var, command=self.toggle_watch).pack(pady=(0, 10))
                   
     def select_docx_dir(self):
         dir_path = filedialog.askdirectory(title="Selecione o diretório contendo os modelos .docx")
@@ -111,44 +248,91 @@ class DocumentFillerApp:
             self.docx_dir = dir_path
             self.load_docx_from_dir(dir_path)
     
-    def load_docx_from_dir(self, dir_path):
-        """Carrega os arquivos .docx do diretório especificado"""
-        # Limpar os checkboxes existentes
-        for cb in self.doc_checkboxes:
-            cb.destroy()
-        self.doc_checkboxes = []
-        self.doc_vars = {}
+    def load_docx_from_dir(self, dir_path, quiet=False):
+        """
+        Carrega os arquivos .docx do diretório especificado. Os checkboxes são
+        atualizados no lugar: só os modelos novos ganham um checkbox, os removidos
+        perdem o seu e a seleção dos demais é mantida.
+        """
+        if self.docs_placeholder_label is not None:
+            self.docs_placeholder_label.destroy()
+            self.docs_placeholder_label = None
         
-        # Procurar por arquivos .docx no diretório
+        # Procurar por arquivos .docx no diretório (listagem via manifesto)
         try:
-            docx_files = [f for f in os.listdir(dir_path) if f.endswith('.docx')]
-            
-            if not docx_files:
+            docx_files = self.manifest.list_dir(dir_path, '.docx')
+            self.manifest.save()
+        except Exception as e:
+            messagebox.showerror("Erro", f"Erro ao carregar arquivos do diretório: {str(e)}")
+            return
+        
+        # Trocar de diretório descarta a lista anterior
+        if dir_path != self.docs_loaded_dir:
+            for cb in self.doc_checkboxes.values():
+                cb.destroy()
+            self.doc_checkboxes = {}
+            self.doc_vars = {}
+            self.docs_loaded_dir = dir_path
+        
+        # Remover checkboxes de modelos que não existem mais
+        for docx_file in [f for f in self.doc_checkboxes if f not in docx_files]:
+            self.doc_checkboxes.pop(docx_file).destroy()
+            del self.doc_vars[docx_file]
+        
+        if not docx_files:
+            if not quiet:
                 messagebox.showinfo("Informação", "Nenhum arquivo .docx encontrado no diretório selecionado.")
-                return
-                
-            # Criar checkboxes para cada arquivo .docx
-            for idx, docx_file in enumerate(docx_files):
+            return
+        
+        # Criar checkboxes apenas para os novos arquivos .docx e reposicionar todos
+        for idx, docx_file in enumerate(docx_files):
+            if docx_file not in self.doc_checkboxes:
                 var = tk.BooleanVar()
-                cb = ttk.Checkbutton(self.docs_checkbox_frame, text=docx_file, variable=var)
-                cb.grid(row=idx // 2, column=idx % 2, sticky=tk.W, padx=10, pady=5)
+                self.doc_checkboxes[docx_file] = ttk.Checkbutton(self.docs_checkbox_frame, text=docx_file, variable=var)
                 self.doc_vars[docx_file] = var
-                self.doc_checkboxes.append(cb)
-                
-            # Mostrar o caminho do diretório
-            ttk.Label(self.docs_checkbox_frame, 
-                     text=f"Diretório de modelos: {dir_path}",
-                     font=("Arial", 8)).grid(row=(len(docx_files) // 2) + 1, column=0, columnspan=2, 
-                                           sticky=tk.W, padx=10, pady=5)
+            self.doc_checkboxes[docx_file].grid(row=idx // 2, column=idx % 2, sticky=tk.W, padx=10, pady=5)
+        
+        # Mostrar o caminho do diretório
+        if self.docs_dir_label is None:
+            self.docs_dir_label = ttk.Label(self.docs_checkbox_frame, font=("Arial", 8))
+        self.docs_dir_label.config(text=f"Diretório de modelos: {dir_path}")
+        self.docs_dir_label.grid(row=(len(docx_files) // 2) + 1, column=0, columnspan=2, 
+                                 sticky=tk.W, padx=10, pady=5)
+    
+    def toggle_watch(self):
+        # Cancelar a verificação agendada para não manter duas em paralelo
+        if self.watch_after_id is not None:
+            self.root.after_cancel(self.watch_after_id)
+            self.watch_after_id = None
+        if self.watch_var.get():
+            self.watch_after_id = self.root.after(2000, self.poll_model_dirs)
+    
+    def poll_model_dirs(self):
+        """Modo de monitoramento: atualiza a lista de modelos quando as pastas mudam"""
+        self.watch_after_id = None
+        if not self.watch_var.get():
+            return
+        
+        watched = [self.docx_dir, os.path.join(os.getcwd(), "config")]
+        try:
+            if self.manifest.refresh(watched):
+                self.load_json_models()
+                if self.docx_dir:
+                    self.load_docx_from_dir(self.docx_dir, quiet=True)
         except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao carregar arquivos do diretório: {str(e)}")
+            print(f"Erro ao atualizar modelos: {e}")
+        
+        self.watch_after_id = self.root.after(2000, self.poll_model_dirs)
     
     def load_json_models(self):
         # Carregar informações de campos de todos os modelos JSON
+        self.documents_info = {}
+        
         # 1. Verificar no diretório atual
         cwd = os.getcwd()
         config_path = os.path.join(cwd, "config")
-        self.load_json_from_dir(config_path)
+        if os.path.isdir(config_path):
+            self.load_json_from_dir(config_path)
         
         # 2. Se temos um diretório de templates, verificar lá também
         if self.docx_dir and self.docx_dir != os.getcwd():
@@ -156,15 +340,8 @@ class DocumentFillerApp:
     
     def load_json_from_dir(self, directory):
         """Carrega os modelos JSON de um diretório específico"""
-        for json_file in os.listdir(directory):
-            if json_file.endswith('_modelo.json'):
-                try:
-                    with open(os.path.join(directory, json_file), 'r', encoding='utf-8') as f:
-                        json_data = json.load(f)
-                        if 'campos' in json_data:
-                            self.documents_info[json_file] = json_data
-                except Exception as e:
-                    print(f"Erro ao carregar {json_file}: {e}")
+        self.manifest.load_json_models(directory, self.documents_info)
+        self.manifest.save()
     
     def proceed_to_data(self):
         # Verificar quais documentos foram selecionados
@@ -188,8 +365,7 @@ class DocumentFillerApp:
         missing_jsons = []
         
         for selected_doc in self.selected_docs:
-            base_name = selected_doc.split('.')[0]
-            json_file = f"{base_name}.json"
+            json_file = document_engine.config_name_for(selected_doc)
                        
             if json_file not in self.documents_info:
                 missing_jsons.append(selected_doc)
@@ -211,114 +387,75 @@ class DocumentFillerApp:
                             f"Modelos JSON não encontrados para:\n- " + 
                             "\n- ".join(missing_jsons))
             return 
+        
+        # Avisar sobre placeholders do modelo sem campo no JSON (e vice-versa)
+        divergencias = []
+        for selected_doc in self.selected_docs:
+            try:
+                index = document_engine.template_cache.get_index(os.path.join(self.docx_dir, selected_doc))
+            except Exception as e:
+                print(f"Erro ao indexar {selected_doc}: {e}")
+                continue
+            campos = self.documents_info[document_engine.config_name_for(selected_doc)]['campos']
+            texto = document_engine.describe_template_mismatches(selected_doc, index, campos)
+            if texto:
+                divergencias.append(texto)
+        
+        if divergencias:
+            messagebox.showwarning("Divergências entre modelos", "\n\n".join(divergencias))
      
     def setup_data_page(self):
         # Limpar widgets anteriores
         for widget in self.data_frame.winfo_children():
             widget.destroy()
         
-        # Criar canvas para scrollbar
-        canvas = tk.Canvas(self.data_frame)
-        scrollbar = ttk.Scrollbar(self.data_frame, orient="vertical", command=canvas.yview)
-        scrollable_frame = ttk.Frame(canvas)
-        
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
+        # Modelo do formulário: os valores ficam em um dicionário simples (datas como
+        # dd/mm/aaaa) e só os campos da página visível ganham widgets. Valores já
+        # digitados para campos que continuam selecionados são mantidos.
+        previous_values = self.form_values
+        self.form_values = {}
+        for field_key, field_info in self.all_fields.items():
+            if field_key in previous_values:
+                self.form_values[field_key] = previous_values[field_key]
+            elif field_info.get('tipo', 'radio') == 'radio':
+                # Selecionar a primeira opção por padrão
+                self.form_values[field_key] = self.field_options(field_info)[0]
+            else:
+                self.form_values[field_key] = ""
         
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-        
-        # Empacotar canvas e scrollbar
-        canvas.pack(side="left", fill="both", expand=True, padx=10, pady=10)
-        scrollbar.pack(side="right", fill="y")
+        self.form_order = [k for k, _ in sorted(self.all_fields.items(), key=lambda x: x[1]['rotulo'])]
+        self.form_filtered = list(self.form_order)
+        self.form_page = 0
         
         # Label de instrução
-        ttk.Label(scrollable_frame, text="Preencha os campos para os documentos selecionados:", 
-                 font=("Arial", 12)).grid(row=0, column=0, columnspan=2, sticky=tk.W, padx=20, pady=(20, 10))
-        
-        # Adicionar campos agrupados por tipo
-        self.field_entries = {}
-        row = 1
+        ttk.Label(self.data_frame, text="Preencha os campos para os documentos selecionados:", 
+                 font=("Arial", 12)).pack(anchor=tk.W, padx=20, pady=(20, 10))
         
-        for field_key, field_info in sorted(self.all_fields.items(), key=lambda x: x[1]['rotulo']):
-            label_text = field_info['rotulo']
-            if field_info.get('obrigatorio', False):
-                label_text += " *"
-            
-            ttk.Label(scrollable_frame, text=label_text).grid(row=row, column=0, sticky=tk.W, padx=20, pady=5)
-            
-            field_type = field_info.get('tipo', 'radio')  # Garantir que temos um tipo, padrão é 'texto'
-            
-            if field_type == 'radio':
-                # Para campos de radio buttons
-                radio_frame = ttk.Frame(scrollable_frame)
-                radio_var = tk.StringVar()
-                
-                # Verificar se existem opções definidas
-                opcoes = field_info.get('opcoes', [])
-                if not opcoes:
-                    print(f"Aviso: Campo {field_key} do tipo radio não tem opções definidas")
-                    opcoes = ["Opção 1", "Opção 2"]  # Opções padrão
-                
-                for i, opcao in enumerate(opcoes):
-                    rb = ttk.Radiobutton(radio_frame, text=opcao, variable=radio_var, value=opcao)
-                    rb.pack(side=tk.LEFT, padx=5)
-                
-                radio_frame.grid(row=row, column=1, sticky=tk.W, padx=5, pady=5)
-                self.field_entries[field_key] = radio_var
-                
-                # Selecionar a primeira opção por padrão
-                if opcoes:
-                    radio_var.set(opcoes[0])
-
-            elif field_type == 'data':
-                # Para campos de data, usar um combobox para o dia, mês e ano
-                date_frame = ttk.Frame(scrollable_frame)
-                
-                day_var = tk.StringVar()
-                day_combo = ttk.Combobox(date_frame, width=3, textvariable=day_var)
-                day_combo['values'] = [str(i).zfill(2) for i in range(1, 32)]
-                day_combo.pack(side=tk.LEFT, padx=2)
-                
-                ttk.Label(date_frame, text="/").pack(side=tk.LEFT)
-                
-                month_var = tk.StringVar()
-                month_combo = ttk.Combobox(date_frame, width=3, textvariable=month_var)
-                month_combo['values'] = [str(i).zfill(2) for i in range(1, 13)]
-                month_combo.pack(side=tk.LEFT, padx=2)
-                
-                ttk.Label(date_frame, text="/").pack(side=tk.LEFT)
-                
-                year_var = tk.StringVar()
-                year_combo = ttk.Combobox(date_frame, width=5, textvariable=year_var)
-                current_year = datetime.now().year
-                year_combo['values'] = [str(i) for i in range(current_year-5, current_year+2)]
-                year_combo.pack(side=tk.LEFT, padx=2)
-                
-                date_frame.grid(row=row, column=1, sticky=tk.W, padx=5, pady=5)
-                self.field_entries[field_key] = (day_var, month_var, year_var)
-            
-            else:
-                # Para campos de texto
-                if "Resumo" in field_key or "abstract" in field_key:
-                    # Para campos de resumo, usar Text
-                    text_widget = tk.Text(scrollable_frame, height=5, width=50)
-                    text_widget.grid(row=row, column=1, sticky=tk.W, padx=5, pady=5)
-                    self.field_entries[field_key] = text_widget
-                else:
-                    # Para outros campos de texto
-                    text_var = tk.StringVar()
-                    ttk.Entry(scrollable_frame, textvariable=text_var, width=50).grid(
-                        row=row, column=1, sticky=tk.W, padx=5, pady=5)
-                    self.field_entries[field_key] = text_var
-            
-            row += 1
+        # Filtro incremental pelo rótulo
+        filter_frame = ttk.Frame(self.data_frame)
+        filter_frame.pack(fill=tk.X, padx=20)
+        ttk.Label(filter_frame, text="Filtrar campos:").pack(side=tk.LEFT)
+        self.form_filter_var = tk.StringVar()
+        self.form_filter_var.trace_add("write", lambda *args: self.filter_form())
+        ttk.Entry(filter_frame, textvariable=self.form_filter_var, width=40).pack(side=tk.LEFT, padx=5)
+        
+        # Linhas da página visível
+        self.form_rows_frame = ttk.Frame(self.data_frame)
+        self.form_rows_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        
+        # Navegação entre páginas
+        nav_frame = ttk.Frame(self.data_frame)
+        nav_frame.pack(pady=5)
+        self.form_prev_button = ttk.Button(nav_frame, text="◀ Anterior", command=lambda: self.change_form_page(-1))
+        self.form_prev_button.pack(side=tk.LEFT, padx=5)
+        self.form_page_label = ttk.Label(nav_frame)
+        self.form_page_label.pack(side=tk.LEFT, padx=5)
+        self.form_next_button = ttk.Button(nav_frame, text="Próxima ▶", command=lambda: self.change_form_page(1))
+        self.form_next_button.pack(side=tk.LEFT, padx=5)
         
         # Botões para navegar
-        btn_frame = ttk.Frame(scrollable_frame)
-        btn_frame.grid(row=row, column=0, columnspan=2, pady=20)
+        btn_frame = ttk.Frame(self.data_frame)
+        btn_frame.pack(pady=10)
         
         ttk.Button(btn_frame, text="Voltar", command=lambda: self.main_notebook.select(0)).pack(side=tk.LEFT, padx=10)
         ttk.Button(btn_frame, text="Avançar para Geração", command=self.proceed_to_generation).pack(side=tk.LEFT, padx=10)
@@ -326,6 +463,109 @@ class DocumentFillerApp:
         # Botão para carregar dados de JSON
         ttk.Button(btn_frame, text="Carregar Dados de JSON", command=self.load_data_from_json).pack(side=tk.LEFT, padx=10)
         
+        self.render_form_page()
+    
+    def field_options(self, field_info):
+        """Opções de um campo do tipo radio (o aviso de opções ausentes sai ao carregar o modelo)"""
+        return field_info.get('opcoes') or ["Opção 1", "Opção 2"]  # Opções padrão
+    
+    def is_long_text_field(self, field_key):
+        """Campos de resumo usam uma caixa de texto de várias linhas"""
+        return "Resumo" in field_key or "abstract" in field_key
+    
+    def filter_form(self):
+        """Filtra os campos exibidos pelo rótulo, a cada tecla digitada"""
+        text = self.form_filter_var.get().strip().lower()
+        self.form_filtered = [k for k in self.form_order if text in self.all_fields[k]['rotulo'].lower()]
+        self.form_page = 0
+        self.render_form_page()
+    
+    def change_form_page(self, delta):
+        self.form_page += delta
+        self.render_form_page()
+    
+    def render_form_page(self):
+        """Cria os widgets apenas para os campos da página atual"""
+        for widget in self.form_rows_frame.winfo_children():
+            widget.destroy()
+        
+        total_pages = max(1, -(-len(self.form_filtered) // self.FORM_PAGE_SIZE))
+        self.form_page = max(0, min(self.form_page, total_pages - 1))
+        start = self.form_page * self.FORM_PAGE_SIZE
+        
+        for row, field_key in enumerate(self.form_filtered[start:start + self.FORM_PAGE_SIZE]):
+            self.create_field_row(row, field_key, self.all_fields[field_key])
+        
+        self.form_page_label.config(
+            text=f"Página {self.form_page + 1} de {total_pages} ({len(self.form_filtered)} campos)")
+        self.form_prev_button.state(["!disabled"] if self.form_page > 0 else ["disabled"])
+        self.form_next_button.state(["!disabled"] if self.form_page < total_pages - 1 else ["disabled"])
+    
+    def create_field_row(self, row, field_key, field_info):
+        """Rótulo e widget de edição de um campo, ligados ao dicionário form_values"""
+        label_text = field_info['rotulo']
+        if field_info.get('obrigatorio', False):
+            label_text += " *"
+        
+        ttk.Label(self.form_rows_frame, text=label_text).grid(row=row, column=0, sticky=tk.W, padx=10, pady=3)
+        
+        field_type = field_info.get('tipo', 'radio')  # Garantir que temos um tipo, padrão é 'radio'
+        value = self.form_values.get(field_key, "")
+        
+        def bind_var(var):
+            var.trace_add("write", lambda *args: self.form_values.__setitem__(field_key, var.get()))
+        
+        if field_type == 'radio':
+            # Para campos de radio buttons
+            radio_frame = ttk.Frame(self.form_rows_frame)
+            radio_var = tk.StringVar(value=value)
+            for opcao in self.field_options(field_info):
+                ttk.Radiobutton(radio_frame, text=opcao, variable=radio_var, value=opcao).pack(side=tk.LEFT, padx=5)
+            bind_var(radio_var)
+            radio_frame.grid(row=row, column=1, sticky=tk.W, padx=5, pady=3)
+        
+        elif field_type == 'data':
+            # Para campos de data, usar um combobox para o dia, mês e ano
+            date_frame = ttk.Frame(self.form_rows_frame)
+            parts = value.split('/') if value.count('/') == 2 else ["", "", ""]
+            current_year = datetime.now().year
+            choices = ([str(i).zfill(2) for i in range(1, 32)],
+                       [str(i).zfill(2) for i in range(1, 13)],
+                       [str(i) for i in range(current_year-5, current_year+2)])
+            date_vars = []
+            for i, (part, values, width) in enumerate(zip(parts, choices, (3, 3, 5))):
+                if i > 0:
+                    ttk.Label(date_frame, text="/").pack(side=tk.LEFT)
+                var = tk.StringVar(value=part)
+                ttk.Combobox(date_frame, width=width, textvariable=var, values=values).pack(side=tk.LEFT, padx=2)
+                date_vars.append(var)
+            
+            def store_date(*args):
+                self.form_values[field_key] = "/".join(var.get() for var in date_vars)
+            for var in date_vars:
+                var.trace_add("write", store_date)
+            date_frame.grid(row=row, column=1, sticky=tk.W, padx=5, pady=3)
+        
+        elif self.is_long_text_field(field_key):
+            # Para campos de resumo, usar Text
+            text_widget = tk.Text(self.form_rows_frame, height=5, width=50)
+            text_widget.insert('1.0', value)
+            text_widget.edit_modified(False)
+            
+            def store_text(event):
+                if text_widget.edit_modified():
+                    self.form_values[field_key] = text_widget.get('1.0', 'end-1c')
+                    text_widget.edit_modified(False)
+            text_widget.bind("<<Modified>>", store_text)
+            text_widget.grid(row=row, column=1, sticky=tk.W, padx=5, pady=3)
+        
+        else:
+            # Para outros campos de texto
+            text_var = tk.StringVar(value=value)
+            bind_var(text_var)
+            ttk.Entry(self.form_rows_frame, textvariable=text_var, width=50).grid(
+                row=row, column=1, sticky=tk.W, padx=5, pady=3)
+        
     def load_data_from_json(self):
         json_file = filedialog.askopenfilename(title="Selecione o arquivo JSON com os dados",
                                                filetypes=[("Arquivos JSON", "*.json")])
@@ -337,46 +577,29 @@ class DocumentFillerApp:
                 data = json.load(f)
                 
             # Preencher os campos com os dados do JSON
-            for field_key, field_entry in self.field_entries.items():
+            for field_key, field_info in self.all_fields.items():
                 if field_key in data:
                     value = data[field_key]
-                    
-                    # Verificar o tipo de widget/variável
-                    if isinstance(field_entry, tuple):  # Data
-                        day_var, month_var, year_var = field_entry
-                        if isinstance(value, str) and '/' in value:
-                            day, month, year = value.split('/')
-                            day_var.set(day)
-                            month_var.set(month)
-                            year_var.set(year)
-                    elif isinstance(field_entry, tk.Text):  # Text widget
-                        field_entry.delete('1.0', tk.END)
-                        field_entry.insert('1.0', value)
-                    else:  # StringVar (para texto ou radio)
-                        field_entry.set(value)
-                        
+                    if field_info.get('tipo') == 'data':
+                        if isinstance(value, str) and value.count('/') == 2:
+                            self.form_values[field_key] = value
+                    else:
+                        self.form_values[field_key] = str(value)
+            
+            self.render_form_page()
             messagebox.showinfo("Sucesso", "Dados carregados com sucesso!")
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao carregar dados: {str(e)}")
     
     def proceed_to_generation(self):
-        # Validar campos obrigatórios
-        missing_fields = []
+        # Obter valores dos campos (caixas de resumo sem espaços nas pontas)
+        values = {}
+        for field_key in self.all_fields:
+            value = self.form_values.get(field_key, "")
+            values[field_key] = value.strip() if self.is_long_text_field(field_key) else value
         
-        for field_key, field_info in self.all_fields.items():
-            if field_info.get('obrigatorio', False):
-                field_entry = self.field_entries.get(field_key)
-                
-                if isinstance(field_entry, tuple):  # Data
-                    day_var, month_var, year_var = field_entry
-                    if not (day_var.get() and month_var.get() and year_var.get()):
-                        missing_fields.append(field_info['rotulo'])
-                elif isinstance(field_entry, tk.Text):  # Text widget
-                    if not field_entry.get('1.0', tk.END).strip():
-                        missing_fields.append(field_info['rotulo'])
-                elif isinstance(field_entry, tk.StringVar):  # StringVar
-                    if not field_entry.get().strip():
-                        missing_fields.append(field_info['rotulo'])
+        # Validar campos obrigatórios
+        missing_fields = document_engine.find_missing_fields(self.all_fields, values)
         
         if missing_fields:
             messagebox.showwarning("Campos obrigatórios", 
@@ -384,19 +607,7 @@ class DocumentFillerApp:
                                   "\n- ".join(missing_fields))
             return
         
-        # Obter valores dos campos
-        self.field_values = {}
-        
-        for field_key, field_entry in self.field_entries.items():
-            if isinstance(field_entry, tuple):  # Data
-                day_var, month_var, year_var = field_entry
-                date_value = f"{day_var.get()}/{month_var.get()}/{year_var.get()}"
-                self.field_values[field_key] = date_value
-            elif isinstance(field_entry, tk.Text):  # Text widget
-                text_value = field_entry.get('1.0', tk.END).strip()
-                self.field_values[field_key] = text_value
-            else:  # StringVar (para texto ou radio)
-                self.field_values[field_key] = field_entry.get()
+        self.field_values = values
         
         # Configurar página de geração
         self.setup_gen_page()
@@ -456,6 +667,12 @@ class DocumentFillerApp:
                 ttk.Label(scrollable_frame, text=self.field_values[field_key]).grid(row=row, column=1, sticky=tk.W)
                 row += 1
         
+        # Exportação opcional em PDF, feita enquanto os demais documentos são gerados
+        ttk.Checkbutton(self.gen_frame, text="Exportar também em PDF (requer LibreOffice)",
+                        variable=self.pdf_var).pack(anchor=tk.W, padx=20)
+        ttk.Checkbutton(self.gen_frame, text="Salvar todos os documentos em um único arquivo ZIP",
+                        variable=self.zip_var).pack(anchor=tk.W, padx=20)
+        
         # Frame para botões
         btn_frame = ttk.Frame(self.gen_frame)
         btn_frame.pack(pady=20)
@@ -483,118 +700,35 @@ class DocumentFillerApp:
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao salvar dados: {str(e)}")
 
-    def replace_text_preserve_formatting(self, paragraph, old_text, new_text):
-        """
-        Substitui texto mantendo TODA a formatação original (estilos, fontes, cores, etc.)
-        """
-        if old_text not in paragraph.text:
-            return False
-
-        # Lista para armazenar informações sobre as runs
-        run_info = []
-        current_pos = 0
-        
-        # Coletar informações sobre todas as runs do parágrafo
-        for run in paragraph.runs:
-            run_text = run.text
-            run_length = len(run_text)
-            run_info.append({
-                'run': run,
-                'start': current_pos,
-                'end': current_pos + run_length,
-                'text': run_text,
-                'font': run.font
-            })
-            current_pos += run_length
-
-        # Encontrar todas as ocorrências do texto a substituir
-        full_text = paragraph.text
-        occurrences = []
-        start = 0
-        while True:
-            pos = full_text.find(old_text, start)
-            if pos == -1:
-                break
-            occurrences.append((pos, pos + len(old_text)))
-            start = pos + len(old_text)
-
-        if not occurrences:
-            return False
-
-        # Processar de trás para frente para não alterar posições
-        for start_pos, end_pos in reversed(occurrences):
-            # Identificar quais runs contêm o texto a substituir
-            affected_runs = []
-            for info in run_info:
-                if info['start'] < end_pos and info['end'] > start_pos:
-                    affected_runs.append(info)
-
-            if not affected_runs:
-                continue
-
-            # Para cada run afetada, calcular a parte que precisa ser substituída
-            for run_data in affected_runs:
-                run = run_data['run']
-                run_start = run_data['start']
-                run_end = run_data['end']
-                
-                # Calcular posições relativas dentro da run
-                rel_start = max(0, start_pos - run_start)
-                rel_end = min(len(run.text), end_pos - run_start)
-                
-                # Parte antes da substituição
-                before_text = run.text[:rel_start]
-                
-                # Parte depois da substituição
-                after_text = run.text[rel_end:]
-                
-                # Determinar qual parte do novo texto vai nesta run
-                if run == affected_runs[0]['run']:  # Primeira run afetada
-                    new_part = new_text
-                else:
-                    new_part = ""
-                
-                # Construir o novo texto para esta run
-                run.text = before_text + new_part + after_text
-
-        return True
-
-    def copy_run_formatting(source_run, target_run):
-        """Copia TODOS os atributos de formatação de uma run para outra"""
-        # Atributos básicos
-        target_run.bold = source_run.bold
-        target_run.italic = source_run.italic
-        target_run.underline = source_run.underline
-        
-        # Propriedades da fonte
-        if source_run.font.name:
-            target_run.font.name = source_run.font.name
-        if source_run.font.size:
-            target_run.font.size = source_run.font.size
-        if source_run.font.color.rgb:
-            target_run.font.color.rgb = source_run.font.color.rgb
-        target_run.font.highlight_color = source_run.font.highlight_color
-        target_run.font.subscript = source_run.font.subscript
-        target_run.font.superscript = source_run.font.superscript
-        target_run.font.strike = source_run.font.strike
-        target_run.font.all_caps = source_run.font.all_caps
-        target_run.font.small_caps = source_run.font.small_caps
-
-
-
     def generate_documents(self):
-        # Pedir diretório para salvar os documentos gerados
-        output_dir = filedialog.askdirectory(title="Selecione o diretório para salvar os documentos gerados")
-        if not output_dir:
+        if self.generating:
+            messagebox.showinfo("Geração em andamento", "Aguarde o fim da geração atual ou cancele-a.")
             return
         
+        zip_path = None
+        if self.zip_var.get():
+            # Pedir o arquivo ZIP que receberá os documentos do aluno
+            zip_path = filedialog.asksaveasfilename(
+                title="Salvar documentos como ZIP", defaultextension=".zip",
+                initialfile=os.path.splitext(document_engine.output_filename("documentos.docx", self.field_values))[0] + ".zip",
+                filetypes=[("Arquivos ZIP", "*.zip")])
+            if not zip_path:
+                return
+            output_dir = os.path.dirname(zip_path)
+        else:
+            # Pedir diretório para salvar os documentos gerados
+            output_dir = filedialog.askdirectory(title="Selecione o diretório para salvar os documentos gerados")
+            if not output_dir:
+                return
+        
+        progress_window = None
+        zip_file = None
         try:
-            # Mostrar progresso
+            # Mostrar progresso (sem grab_set: a janela principal continua utilizável)
             progress_window = tk.Toplevel(self.root)
             progress_window.title("Gerando documentos...")
-            progress_window.geometry("400x150")
+            progress_window.geometry("400x180")
             progress_window.transient(self.root)
-            progress_window.grab_set()
             
             # Centralizar janela
             progress_window.update_idletasks()
@@ -609,140 +743,234 @@ class DocumentFillerApp:
             progress_bar = ttk.Progressbar(progress_window, orient="horizontal", length=300, mode="determinate")
             progress_bar.pack(pady=10)
             progress_label = ttk.Label(progress_window, text="Processando...")
-            progress_label.pack(pady=10)
+            progress_label.pack(pady=5)
+            cancel_button = ttk.Button(progress_window, text="Cancelar")
+            cancel_button.pack(pady=5)
             
-            progress_window.update()
+            # Conversor PDF compartilhado entre as gerações; sem LibreOffice, gera só os .docx
+            converter = None
+            if self.pdf_var.get() and zip_path:
+                messagebox.showwarning("PDF", "A exportação em PDF não está disponível na saída em ZIP.",
+                                       parent=progress_window)
+            elif self.pdf_var.get():
+                try:
+                    converter = self.get_pdf_converter()
+                except FileNotFoundError as e:
+                    messagebox.showwarning("PDF", f"{e}\nOs documentos serão gerados apenas em .docx.",
+                                           parent=progress_window)
             
-            # Total de documentos para cálculo de progresso
+            # Uma tarefa por documento, executadas em paralelo em um pool de processos
             total_docs = len(self.selected_docs)
-            docs_gerados = []
+            output_files = {}
+            for doc_name in self.selected_docs:
+                output_files[doc_name] = document_engine.output_filename(doc_name, self.field_values)
             
-            # Processar cada documento selecionado
-            for i, doc_name in enumerate(self.selected_docs):
-                # Atualizar progresso
-                progress_bar["value"] = (i / total_docs) * 100
-                progress_label.config(text=f"Processando: {doc_name}")
-                progress_window.update()
-                
-                doc_path = os.path.join(self.docx_dir, doc_name)
-                
-                # Carregar o documento
-                doc = Document(doc_path)
-                
-                # Processar todos os parágrafos
-                for para in doc.paragraphs:
-                    for field_key, field_value in self.field_values.items():
-                        if field_key in para.text:
-                            self.replace_text_preserve_formatting(para, field_key, field_value)
-                
-                # Processar tabelas
-                for table in doc.tables:
-                    for row in table.rows:
-                        for cell in row.cells:
-                            for para in cell.paragraphs:
-                                for field_key, field_value in self.field_values.items():
-                                    if field_key in para.text:
-                                        self.replace_text_preserve_formatting(para, field_key, field_value)
-
-                # Substituir nos cabeçalhos e rodapés
-                for section in doc.sections:
-                    # Processar cabeçalho
-                    if section.header is not None:
-                        for paragraph in section.header.paragraphs:
-                            if paragraph.text:  # Verificar se o parágrafo tem texto
-                                for field_key, field_value in self.field_values.items():
-                                    if field_key in paragraph.text:
-                                        self.replace_text_preserve_formatting(paragraph, field_key, field_value)
-                    
-                    # Processar rodapé
-                    if section.footer is not None:
-                        for paragraph in section.footer.paragraphs:
-                            if paragraph.text:  # Verificar se o parágrafo tem texto
-                                for field_key, field_value in self.field_values.items():
-                                    if field_key in paragraph.text:
-                                        self.replace_text_preserve_formatting(paragraph, field_key, field_value)        
-#                 # Substituir nos cabeçalhos e rodapés
-#                 for section in doc.sections:
-#                     # Verificar se o cabeçalho/rodapé não é None antes de tentar iterar
-#                     if section.header and section.header.paragraphs:
-#                         for paragraph in section.header.paragraphs:
-#                             for field_key, field_value in self.field_values.items():
-#                                 if field_key in paragraph.text:
-#                                     self.replace_text_preserve_formatting(para, field_key, field_value)
-#  #                                   paragraph.text = paragraph.text.replace(field_key, field_value)
-                    
-#                     if section.footer and section.footer.paragraphs:
-#                         for paragraph in section.footer.paragraphs:
-#                             for field_key, field_value in self.field_values.items():
-#                                 if field_key in paragraph.text:
-#                                     self.replace_text_preserve_formatting(para, field_key, field_value)
-#                                     paragraph.text = paragraph.text.replace(field_key, field_value)
-                
-                # Definir nome do arquivo de saída
-                base_name = os.path.splitext(doc_name)[0]
-                nome_aluno = self.field_values.get("[nome do aluno]", "").replace(" ", "_")
-                if not nome_aluno:
-                    nome_aluno = datetime.now().strftime("%Y%m%d_%H%M%S")
-                
-                output_filename = f"{base_name}_{nome_aluno}.docx"
-                output_path = os.path.join(output_dir, output_filename)
-                
-                # Salvar o documento
-                doc.save(output_path)
-                docs_gerados.append(output_filename)
+            executor = self.get_executor()
+            # Canal entre as threads do executor/conversor e a thread do Tk
+            progress_queue = queue.Queue()
+            cancel_event = threading.Event()
+            # Tarefas enviadas ao pool e ainda não consumidas pela thread do Tk
+            futures = set()
+            pdf_futures = []
+            pending_docs = iter(self.selected_docs)
             
-            # Fechar janela de progresso
-            progress_window.destroy()
+            def on_generated(future, doc_name):
+                # Roda em uma thread do executor: com PDF ativo, já envia o .docx ao
+                # conversor enquanto os próximos são preenchidos, e enfileira o resultado
+                # antes de registrar o callback do PDF (a mensagem do .docx vem sempre antes)
+                pdf_future = None
+                if (converter is not None and not cancel_event.is_set()
+                        and not future.cancelled() and future.exception() is None):
+                    (output_path, _), _ = future.result()
+                    pdf_future = converter.submit(output_path)
+                    pdf_futures.append(pdf_future)
+                progress_queue.put(("docx", doc_name, future, pdf_future is not None))
+                if pdf_future is not None:
+                    pdf_future.add_done_callback(lambda f: progress_queue.put(("pdf", doc_name, f, False)))
             
-            # Mostrar resultado
-            result_window = tk.Toplevel(self.root)
-            result_window.title("Documentos Gerados")
-            result_window.geometry("500x400")
-            result_window.transient(self.root)
+            def submit_pending():
+                # Limitar as tarefas em andamento (como em batch_docs.run_batch): no ZIP, os
+                # bytes de cada documento ficam em memória só até serem gravados pela thread do Tk
+                while len(futures) < MAX_PENDING_PER_WORKER * (os.cpu_count() or 1) and not cancel_event.is_set():
+                    doc_name = next(pending_docs, None)
+                    if doc_name is None:
+                        return
+                    # Documentos cujo modelo e campos usados não mudaram são copiados do cache de saídas
+                    template_path = os.path.join(self.docx_dir, doc_name)
+                    if zip_file is not None:
+                        # O documento volta do pool como bytes e é gravado direto no ZIP
+                        future = executor.submit(document_engine.timed_call, document_engine.cached_render_document,
+                                                 template_path, self.field_values)
+                    else:
+                        future = executor.submit(document_engine.timed_call, document_engine.cached_generate_document,
+                                                 template_path,
+                                                 self.field_values,
+                                                 os.path.join(output_dir, output_files[doc_name]))
+                    futures.add(future)
+                    future.add_done_callback(lambda f, name=doc_name: on_generated(f, name))
             
-            # Centralizar janela
-            result_window.update_idletasks()
-            width = result_window.winfo_width()
-            height = result_window.winfo_height()
-            x = (self.root.winfo_screenwidth() // 2) - (width // 2)
-            y = (self.root.winfo_screenheight() // 2) - (height // 2)
-            result_window.geometry(f"{width}x{height}+{x}+{y}")
-            
-            # Adicionar informações de sucesso
-            ttk.Label(result_window, text="Documentos gerados com sucesso!", font=("Arial", 14, "bold")).pack(pady=(20, 10))
-            ttk.Label(result_window, text=f"Diretório: {output_dir}").pack(pady=(0, 10))
-            
-            # Lista de documentos gerados com scrollbar
-            frame = ttk.Frame(result_window)
-            frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
-            
-            scrollbar = ttk.Scrollbar(frame)
-            scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-            
-            listbox = tk.Listbox(frame, yscrollcommand=scrollbar.set, font=("Arial", 10))
-            for doc in docs_gerados:
-                listbox.insert(tk.END, doc)
+            if zip_path:
+                zip_file = zipfile.ZipFile(zip_path, 'w')
+            submit_pending()
+        except Exception as e:
+            if progress_window is not None:
+                progress_window.destroy()
+            if zip_file is not None:
+                zip_file.close()
+            messagebox.showerror("Erro", f"Erro ao gerar documentos: {str(e)}")
+            return
+        
+        self.generating = True
+        
+        def cancel():
+            # Os documentos em andamento terminam (e ficam íntegros); os que ainda
+            # esperam no pool ou na fila de PDF, ou nem foram enviados, são descartados
+            nonlocal cancelados
+            cancel_event.set()
+            cancelados += sum(1 for _ in pending_docs)
+            for future in list(futures) + pdf_futures:
+                future.cancel()
+            cancel_button.state(["disabled"])
+            progress_label.config(text="Cancelando... aguardando os documentos em andamento")
+        
+        cancel_button.config(command=cancel)
+        progress_window.protocol("WM_DELETE_WINDOW", cancel)
+        
+        concluidos = []
+        erros = []
+        # Tempos por documento: {doc_name: {"docx": segundos, "pdf": segundos, "cache": reaproveitado}}
+        timings = {}
+        pdf_pendentes = 0
+        falhas_docx = 0
+        cancelados = 0
+        
+        def poll_progress():
+            nonlocal pdf_pendentes, falhas_docx, cancelados
+            # Consumir os resultados disponíveis na thread principal do Tk, em lotes
+            # pequenos para não atrasar o redesenho da interface
+            for _ in range(POLL_BATCH):
+                try:
+                    stage, doc_name, future, pdf_submitted = progress_queue.get_nowait()
+                except queue.Empty:
+                    break
+                
+                if stage == "pdf":
+                    pdf_pendentes -= 1
+                else:
+                    futures.discard(future)
+                if future.cancelled():
+                    cancelados += stage == "docx"
+                    continue
+                
+                try:
+                    result, seconds = future.result()
+                    timings.setdefault(doc_name, {})[stage] = seconds
+                    if stage == "docx":
+                        payload, rebuilt = result
+                        if zip_file is not None:
+                            document_engine.write_zip_member(zip_file, output_files[doc_name], payload)
+                        if not rebuilt:
+                            timings[doc_name]["cache"] = True
+                        concluidos.append(doc_name)
+                        if pdf_submitted:
+                            pdf_pendentes += 1
+                except Exception as e:
+                    if stage == "docx":
+                        falhas_docx += 1
+                        erros.append(f"{doc_name}: {e}")
+                    else:
+                        erros.append(f"{doc_name} (PDF): {e}")
+                
+                done = len(concluidos) + falhas_docx
+                progress_bar["value"] = (done / total_docs) * 100
+                texto = f"Concluído: {doc_name} ({done}/{total_docs})"
+                if converter is not None:
+                    texto += f" – PDFs pendentes: {pdf_pendentes}"
+                if not cancel_event.is_set():
+                    progress_label.config(text=texto)
             
-            listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-            scrollbar.config(command=listbox.yview)
+            submit_pending()
+            if len(concluidos) + falhas_docx + cancelados < total_docs or pdf_pendentes:
+                self.root.after(POLL_INTERVAL_MS, poll_progress)
+                return
             
-            # Botão para abrir o diretório
-            def open_directory():
-                if os.name == 'nt':  # Windows
-                    os.startfile(output_dir)
-                elif os.name == 'posix':  # macOS ou Linux
-                    import subprocess
-                    subprocess.Popen(['xdg-open', output_dir])
+            progress_window.destroy()
+            if zip_file is not None:
+                zip_file.close()
+            self.generating = False
             
-            ttk.Button(result_window, text="Abrir Diretório", command=open_directory).pack(pady=20)
-            ttk.Button(result_window, text="Fechar", command=result_window.destroy).pack(pady=(0, 20))
-        
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao gerar documentos: {str(e)}")
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao gerar documentos: {str(e)}")
+            if cancel_event.is_set():
+                messagebox.showinfo("Cancelado", f"Geração cancelada: {len(concluidos)} de {total_docs} "
+                                                 f"documentos foram gerados e mantidos.")
+            if erros:
+                messagebox.showerror("Erro", "Erro ao gerar documentos:\n- " + "\n- ".join(erros))
+            if concluidos:
+                # Manter a ordem da seleção na lista de resultados
+                docs_gerados = [output_files[doc] for doc in self.selected_docs if doc in concluidos]
+                self.show_generation_results(output_dir, docs_gerados,
+                                             {output_files[doc]: t for doc, t in timings.items()})
+        
+        self.root.after(POLL_INTERVAL_MS, poll_progress)
+    
+    def show_generation_results(self, output_dir, docs_gerados, timings=None):
+        # Mostrar resultado
+        result_window = tk.Toplevel(self.root)
+        result_window.title("Documentos Gerados")
+        result_window.geometry("500x400")
+        result_window.transient(self.root)
+        
+        # Centralizar janela
+        result_window.update_idletasks()
+        width = result_window.winfo_width()
+        height = result_window.winfo_height()
+        x = (self.root.winfo_screenwidth() // 2) - (width // 2)
+        y = (self.root.winfo_screenheight() // 2) - (height // 2)
+        result_window.geometry(f"{width}x{height}+{x}+{y}")
+        
+        # Adicionar informações de sucesso
+        ttk.Label(result_window, text="Documentos gerados com sucesso!", font=("Arial", 14, "bold")).pack(pady=(20, 10))
+        ttk.Label(result_window, text=f"Diretório: {output_dir}").pack(pady=(0, 10))
+        if os.environ.get(document_engine.STAGE_TIMINGS_ENV):
+            ttk.Label(result_window, text=f"Tempos por etapa: {document_engine.stage_timings_log()}").pack()
+        if timings:
+            reaproveitados = sum(1 for doc in docs_gerados if timings.get(doc, {}).get("cache"))
+            ttk.Label(result_window, text=f"{len(docs_gerados) - reaproveitados} reconstruídos, "
+                                          f"{reaproveitados} sem alterações (reaproveitados do cache)").pack()
+        
+        # Lista de documentos gerados com scrollbar
+        frame = ttk.Frame(result_window)
+        frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
+        
+        scrollbar = ttk.Scrollbar(frame)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        listbox = tk.Listbox(frame, yscrollcommand=scrollbar.set, font=("Arial", 10))
+        for doc in docs_gerados:
+            # Tempo de cada etapa por documento (preenchimento e, se houver, PDF)
+            tempos = (timings or {}).get(doc, {})
+            etapas = [f"{etapa.upper()} {tempos[etapa]:.2f} s" for etapa in ("docx", "pdf") if etapa in tempos]
+            if tempos.get("cache"):
+                etapas.insert(0, "sem alterações")
+            listbox.insert(tk.END, f"{doc}  ({', '.join(etapas)})" if etapas else doc)
+        
+        listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.config(command=listbox.yview)
+        
+        # Botão para abrir o diretório
+        def open_directory():
+            if os.name == 'nt':  # Windows
+                os.startfile(output_dir)
+            elif os.name == 'posix':  # macOS ou Linux
+                import subprocess
+                subprocess.Popen(['xdg-open', output_dir])
+        
+        ttk.Button(result_window, text="Abrir Diretório", command=open_directory).pack(pady=20)
+        ttk.Button(result_window, text="Fechar", command=result_window.destroy).pack(pady=(0, 20))
 
 if __name__ == "__main__":
+    # Necessário para o pool de processos no executável do PyInstaller
+    multiprocessing.freeze_support()
     root = tk.Tk()
+    startup_mark("Tk() criado")
     app = DocumentFillerApp(root)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,59 @@
+# -*- mode: python ; coding: utf-8 -*-
+# Variante de inicialização rápida: pasta (onedir) em vez de arquivo único, sem
+# descompactar o pacote a cada execução, sem UPX e sem módulos que o programa não usa.
+# Gerar com: python -m PyInstaller automatic_docs_onedir.spec
+from PyInstaller.utils.hooks import collect_data_files
+
+datas = []
+datas += collect_data_files('docx')
+
+
+a = Analysis(
+    ['automatic_docs.py'],
+    pathex=[],
+    binaries=[],
+    datas=datas,
+    hiddenimports=['docx', 'document_engine', 'batch_docs', 'pdf_export'],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=[
+        # python-docx usa apenas lxml.etree
+        'lxml.html', 'lxml.isoschematron', 'lxml.objectify', 'lxml.sax', 'lxml.cssselect',
+        # Bibliotecas científicas/ferramentas que podem estar no ambiente mas não são usadas
+        'numpy', 'pandas', 'matplotlib', 'scipy', 'sklearn', 'seaborn', 'PIL',
+        'IPython', 'jupyter', 'notebook', 'pytest', 'setuptools', 'pydoc', 'doctest',
+        'tkinter.test', 'xmlrpc', 'http.server', 'curses', 'sqlite3',
+    ],
+    noarchive=False,
+    optimize=1,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='automatic_docs',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,
+    console=False,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+)
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='automatic_docs',
+)
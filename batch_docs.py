@@ -0,0 +1,296 @@
+"""
+Geração em lote (sem interface gráfica) dos documentos de defesa.
+
+Uso:
+    python automatic_docs.py batch --templates templates/ --config config/ --data roster.jsonl --out out/
+    python batch_docs.py --templates templates/ --config config/ --data roster.csv --out out/ --pdf
+
+Cada linha do arquivo de dados (CSV com cabeçalho ou JSONL) gera um pacote com
+os documentos selecionados em uma subpasta própria de --out. Com --pdf, cada
+documento gerado é convertido em seguida por um único LibreOffice headless.
+Com --zip student|batch, os documentos são gerados em memória e gravados direto
+em um ZIP por aluno (<pacote>.zip) ou em um único ZIP do lote (documentos.zip).
+Documentos cujo modelo e campos usados não mudaram desde a última geração são
+reaproveitados do cache de saídas (desative com --no-cache).
+"""
+import os
+import sys
+import csv
+import json
+import zipfile
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import document_engine
+
+
+def iter_roster(data_path):
+    """Lê o arquivo de alunos linha a linha (CSV ou JSONL), sem carregar tudo em memória"""
+    if data_path.lower().endswith('.csv'):
+        with open(data_path, 'r', encoding='utf-8-sig', newline='') as f:
+            for row in csv.DictReader(f):
+                yield row
+    else:
+        with open(data_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def build_field_values(fields, row):
+    """
+    Monta os valores dos campos a partir de uma linha do arquivo de dados,
+    aceitando chaves com ou sem colchetes ('[nome_aluno]' ou 'nome_aluno').
+    Campos ausentes recebem o mesmo valor padrão da interface gráfica.
+    """
+    field_values = {}
+    for field_key, field_info in fields.items():
+        value = row.get(field_key)
+        if value is None:
+            value = row.get(field_key.strip('[]'))
+        if value is None:
+            opcoes = field_info.get('opcoes', [])
+            value = opcoes[0] if field_info.get('tipo', 'radio') == 'radio' and opcoes else ""
+        field_values[field_key] = str(value).strip()
+    return field_values
+
+
+def validate_row(fields, field_values):
+    """Retorna a lista de problemas encontrados nos valores de uma linha"""
+    problemas = [f"campo obrigatório vazio: {rotulo}"
+                 for rotulo in document_engine.find_missing_fields(fields, field_values)]
+
+    for field_key, field_info in fields.items():
+        opcoes = field_info.get('opcoes')
+        value = field_values.get(field_key)
+        if field_info.get('tipo') == 'radio' and opcoes and value and value not in opcoes:
+            problemas.append(f"valor inválido para {field_info['rotulo']}: '{value}' (opções: {', '.join(opcoes)})")
+
+    return problemas
+
+
+def select_templates(templates_dir, documents_info, docs=None):
+    """Seleciona os modelos .docx que possuem um modelo JSON correspondente"""
+    docx_files = sorted(f for f in os.listdir(templates_dir) if f.endswith('.docx'))
+    if docs:
+        unknown = [d for d in docs if d not in docx_files]
+        if unknown:
+            raise ValueError(f"Modelos não encontrados em {templates_dir}: {', '.join(unknown)}")
+        docx_files = list(docs)
+
+    selected = []
+    for docx_file in docx_files:
+        if document_engine.config_name_for(docx_file) in documents_info:
+            selected.append(docx_file)
+        elif docs:
+            raise ValueError(f"Modelo JSON não encontrado para {docx_file}")
+        else:
+            print(f"Aviso: {docx_file} ignorado (sem modelo JSON correspondente)")
+    return selected
+
+
+def packet_dirname(row_number, field_values):
+    """Nome da subpasta de um pacote: <linha>_<nome do aluno>"""
+    for key in document_engine.STUDENT_NAME_KEYS:
+        nome_aluno = field_values.get(key, "").strip().replace(" ", "_")
+        if nome_aluno:
+            return f"{row_number:04d}_{nome_aluno}"
+    return f"{row_number:04d}"
+
+
+# Nome do ZIP único do lote (--zip batch)
+BATCH_ZIP_NAME = "documentos.zip"
+
+
+def run_batch(templates_dir, config_dir, data_path, output_dir, docs=None, workers=None, engine="docx",
+              pdf=False, zip_mode=None, use_cache=True):
+    """
+    Gera um pacote por linha do arquivo de dados, com uma tarefa por par
+    (modelo, aluno) distribuída em um pool de processos. Com pdf=True, cada
+    documento concluído vai para a fila de conversão enquanto os demais são gerados.
+    Com zip_mode ("student" ou "batch"), cada documento volta do pool como bytes e
+    é gravado direto no ZIP do aluno ou do lote, sem arquivos intermediários.
+    Com use_cache, documentos sem alteração são copiados do cache de saídas.
+    Retorna (documentos gerados, linhas com erro, documentos com falha).
+    """
+    if pdf and zip_mode:
+        raise ValueError("A exportação em PDF não pode ser combinada com --zip.")
+    generate = document_engine.ENGINES[engine]
+
+    manifest = document_engine.ModelManifest()
+    documents_info = manifest.load_json_models(config_dir)
+    manifest.save()
+    selected_docs = select_templates(templates_dir, documents_info, docs)
+    if not selected_docs:
+        raise ValueError("Nenhum modelo selecionado para geração.")
+
+    # União dos campos de todos os modelos selecionados, com o relatório de
+    # divergências entre os placeholders de cada modelo e o seu JSON
+    fields = {}
+    for doc_name in selected_docs:
+        campos = documents_info[document_engine.config_name_for(doc_name)]['campos']
+        fields.update(campos)
+        index = document_engine.template_cache.get_index(os.path.join(templates_dir, doc_name))
+        divergencias = document_engine.describe_template_mismatches(doc_name, index, campos)
+        if divergencias:
+            print(f"Aviso: {divergencias}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    gerados = 0
+    erros = 0
+    falhas = 0
+    reaproveitados = 0
+    pending = set()
+    pdf_futures = []
+    # ZIPs abertos: pacote -> [ZipFile, documentos ainda pendentes do pacote]
+    open_zips = {}
+    if zip_mode == "batch":
+        batch_zip = zipfile.ZipFile(os.path.join(output_dir, BATCH_ZIP_NAME), 'w')
+
+    def collect(done):
+        nonlocal gerados, falhas, reaproveitados
+        for future in done:
+            output_path = future.output_path
+            try:
+                result = future.result()
+                rebuilt = True
+                if use_cache:
+                    result, rebuilt = result
+                    reaproveitados += not rebuilt
+                if zip_mode:
+                    # Um documento por vez em memória: grava no ZIP e descarta os bytes
+                    zip_entry = open_zips[future.packet]
+                    document_engine.write_zip_member(zip_entry[0], output_path, result)
+                gerados += 1
+                print(f"[{gerados}] {output_path}{'' if rebuilt else ' (sem alterações, do cache)'}")
+                if converter is not None:
+                    pdf_future = converter.submit(output_path)
+                    pdf_future.output_path = output_path
+                    pdf_futures.append(pdf_future)
+            except Exception as e:
+                falhas += 1
+                print(f"Erro ao gerar {output_path}: {e}")
+            finally:
+                if zip_mode:
+                    finish_zip_entry(future.packet)
+
+    def finish_zip_entry(packet):
+        zip_entry = open_zips[packet]
+        zip_entry[1] -= 1
+        if not zip_entry[1]:
+            del open_zips[packet]
+            if zip_mode == "student":
+                zip_entry[0].close()
+
+    converter = None
+    if pdf:
+        import pdf_export
+        converter = pdf_export.PdfConverter()
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for row_number, row in enumerate(iter_roster(data_path), start=1):
+                field_values = build_field_values(fields, row)
+                problemas = validate_row(fields, field_values)
+                if problemas:
+                    erros += 1
+                    print(f"Linha {row_number}: ignorada\n  - " + "\n  - ".join(problemas))
+                    continue
+
+                packet = packet_dirname(row_number, field_values)
+                if zip_mode == "student":
+                    open_zips[packet] = [zipfile.ZipFile(os.path.join(output_dir, packet + ".zip"), 'w'),
+                                         len(selected_docs)]
+                elif zip_mode == "batch":
+                    open_zips[packet] = [batch_zip, len(selected_docs)]
+                else:
+                    os.makedirs(os.path.join(output_dir, packet), exist_ok=True)
+
+                for doc_name in selected_docs:
+                    template_path = os.path.join(templates_dir, doc_name)
+                    filename = document_engine.output_filename(doc_name, field_values)
+                    if zip_mode:
+                        output_path = filename if zip_mode == "student" else f"{packet}/{filename}"
+                        render = document_engine.cached_render_document if use_cache else document_engine.render_document
+                        future = executor.submit(render, template_path, field_values, engine)
+                    else:
+                        output_path = os.path.join(output_dir, packet, filename)
+                        if use_cache:
+                            future = executor.submit(document_engine.cached_generate_document,
+                                                     template_path, field_values, output_path, engine)
+                        else:
+                            future = executor.submit(generate, template_path, field_values, output_path)
+                    future.output_path = output_path
+                    future.packet = packet
+                    pending.add(future)
+
+                    # Limitar as tarefas em espera para não carregar o arquivo inteiro em memória
+                    if len(pending) >= workers * 4:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        collect(done)
+
+            done, pending = wait(pending)
+            collect(done)
+
+        # PDFs ainda na fila de conversão
+        for pdf_future in pdf_futures:
+            try:
+                pdf_path, seconds = pdf_future.result()
+                print(f"PDF {pdf_path} ({seconds:.2f} s)")
+            except Exception as e:
+                falhas += 1
+                print(f"Erro ao converter {pdf_future.output_path} para PDF: {e}")
+    finally:
+        if converter is not None:
+            converter.close()
+        for zip_file, _ in open_zips.values():
+            zip_file.close()
+        if zip_mode == "batch":
+            batch_zip.close()
+
+    if use_cache:
+        document_engine.prune_output_cache()
+        print(f"\n{gerados - reaproveitados} documentos reconstruídos, {reaproveitados} reaproveitados do cache.")
+    return gerados, erros, falhas
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="automatic_docs.py batch",
+        description="Gera os documentos de defesa em lote a partir de um arquivo CSV ou JSONL.")
+    parser.add_argument("--templates", default="templates", help="Diretório com os modelos .docx")
+    parser.add_argument("--config", default="config", help="Diretório com os modelos *_modelo.json")
+    parser.add_argument("--data", required=True, help="Arquivo de alunos (.csv com cabeçalho ou .jsonl)")
+    parser.add_argument("--out", required=True, help="Diretório de saída dos pacotes")
+    parser.add_argument("--docs", nargs="+", help="Modelos .docx a gerar (padrão: todos com modelo JSON)")
+    parser.add_argument("--workers", type=int, help="Número de processos (padrão: número de núcleos)")
+    parser.add_argument("--engine", choices=sorted(document_engine.ENGINES), default="docx",
+                        help="docx: python-docx com cache de modelos; xml: reescrita direta do XML do .docx")
+    parser.add_argument("--pdf", action="store_true",
+                        help="Converte também cada documento para PDF (requer LibreOffice)")
+    parser.add_argument("--no-cache", dest="use_cache", action="store_false",
+                        help="Regera todos os documentos, sem reaproveitar o cache de saídas")
+    parser.add_argument("--zip", choices=("student", "batch"), dest="zip_mode",
+                        help="Grava os documentos em um ZIP por aluno (student) ou em um único ZIP do lote (batch)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        gerados, erros, falhas = run_batch(args.templates, args.config, args.data, args.out,
+                                           args.docs, args.workers, args.engine, args.pdf, args.zip_mode, args.use_cache)
+    except (OSError, ValueError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 2
+
+    print(f"\n{gerados} documentos gerados, {erros} linhas com erro, {falhas} documentos com falha.")
+    return 1 if erros or falhas else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
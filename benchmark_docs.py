@@ -0,0 +1,259 @@
+"""
+Medição de desempenho do preenchimento dos documentos, etapa por etapa.
+
+Uso:
+    python benchmark_docs.py
+    python benchmark_docs.py --repeat 10 --json resultado.json
+    python benchmark_docs.py --compare resultado.json --tolerance 0.25
+
+Para cada modelo de templates/ (com o seu JSON de config/) e para modelos
+sintéticos de estresse (milhares de parágrafos, tabelas grandes e placeholders
+divididos em muitos runs), mede a mediana de cada etapa (carga do modelo,
+varredura de placeholders, substituição direta, pelo índice e no modelo
+normalizado, normalização e gravação), a geração completa por
+mecanismo e o pico de memória (tracemalloc). Com --compare, termina com código 1
+se alguma etapa ficar mais lenta que o resultado salvo além da tolerância.
+"""
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+
+import document_engine
+
+STAGES = ("load", "scan", "replace", "replace_indexed", "normalize", "replace_normalized", "save")
+ENGINE_STAGES = ("docx", "xml")
+
+
+def sample_field_values(campos):
+    """Valores de teste: primeira opção dos campos radio e um texto para os demais"""
+    field_values = {}
+    for field_key, field_info in campos.items():
+        opcoes = field_info.get('opcoes') or []
+        if field_info.get('tipo', 'radio') == 'radio' and opcoes:
+            field_values[field_key] = opcoes[0]
+        elif field_info.get('tipo') == 'data':
+            field_values[field_key] = "01/01/2025"
+        else:
+            field_values[field_key] = f"Valor de teste para {field_info.get('rotulo', field_key)}"
+    return field_values
+
+
+def build_stress_templates(directory):
+    """Cria os modelos sintéticos de estresse; retorna [(caminho, field_values)]"""
+    Document = document_engine._docx().Document
+    keys = [f"[campo_{i}]" for i in range(50)]
+    field_values = {key: f"valor {i} com um texto um pouco mais longo" for i, key in enumerate(keys)}
+    templates = []
+
+    # Muitos parágrafos, com um placeholder a cada dez
+    doc = Document()
+    for i in range(5000):
+        text = f"Parágrafo {i} de texto corrido sem marcação alguma."
+        if i % 10 == 0:
+            text += f" Campo: {keys[i % len(keys)]}."
+        doc.add_paragraph(text)
+    path = os.path.join(directory, "sintetico_paragrafos.docx")
+    doc.save(path)
+    templates.append((path, field_values))
+
+    # Tabela grande com placeholders nas células
+    doc = Document()
+    table = doc.add_table(rows=300, cols=8)
+    for r, row in enumerate(table.rows):
+        for c, cell in enumerate(row.cells):
+            cell.text = keys[(r * 8 + c) % len(keys)] if (r + c) % 3 == 0 else f"célula {r}.{c}"
+    path = os.path.join(directory, "sintetico_tabela.docx")
+    doc.save(path)
+    templates.append((path, field_values))
+
+    # Placeholders divididos em um run por caractere, com formatação alternada
+    doc = Document()
+    for i in range(500):
+        p = doc.add_paragraph("Início ")
+        for j, char in enumerate(keys[i % len(keys)]):
+            p.add_run(char).bold = bool(j % 2)
+        p.add_run(" fim.")
+    path = os.path.join(directory, "sintetico_runs_divididos.docx")
+    doc.save(path)
+    templates.append((path, field_values))
+
+    return templates
+
+
+def real_templates(templates_dir, config_dir):
+    """Modelos reais com o JSON correspondente; retorna [(caminho, field_values)]"""
+    documents_info = document_engine.load_json_models(config_dir)
+    templates = []
+    for doc_name in sorted(os.listdir(templates_dir)):
+        config_name = document_engine.config_name_for(doc_name)
+        if doc_name.endswith('.docx') and config_name in documents_info:
+            templates.append((os.path.join(templates_dir, doc_name),
+                              sample_field_values(documents_info[config_name]['campos'])))
+    return templates
+
+
+def run_stages(template_path, field_values, pattern):
+    """Executa uma vez cada etapa do preenchimento; retorna {etapa: segundos}"""
+    Document = document_engine._docx().Document
+    timings = {}
+
+    start = time.perf_counter()
+    doc = Document(template_path)
+    timings["load"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = document_engine.compile_template_index(doc)
+    timings["scan"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    document_engine.fill_document(doc, pattern, field_values)
+    timings["replace"] = time.perf_counter() - start
+
+    doc = Document(template_path)
+    start = time.perf_counter()
+    document_engine.fill_document(doc, pattern, field_values, index)
+    timings["replace_indexed"] = time.perf_counter() - start
+
+    doc = Document(template_path)
+    start = time.perf_counter()
+    plan = document_engine.normalize_document(doc)
+    timings["normalize"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    document_engine.fill_normalized_document(doc, plan, pattern, field_values)
+    timings["replace_normalized"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    doc.save(io.BytesIO())
+    timings["save"] = time.perf_counter() - start
+
+    # Geração completa por mecanismo, com o cache de modelos já aquecido
+    for engine in ENGINE_STAGES:
+        start = time.perf_counter()
+        document_engine.render_document(template_path, field_values, engine)
+        timings[engine] = time.perf_counter() - start
+
+    return timings
+
+
+def peak_memory(template_path, field_values, pattern):
+    """Pico de memória (bytes) de cada etapa, medido em uma execução separada"""
+    Document = document_engine._docx().Document
+    peaks = {}
+
+    def measure(stage, func):
+        tracemalloc.start()
+        try:
+            result = func()
+            peaks[stage] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return result
+
+    doc = measure("load", lambda: Document(template_path))
+    measure("scan", lambda: document_engine.compile_template_index(doc))
+    measure("replace", lambda: document_engine.fill_document(doc, pattern, field_values))
+    doc = Document(template_path)
+    plan = measure("normalize", lambda: document_engine.normalize_document(doc))
+    measure("replace_normalized", lambda: document_engine.fill_normalized_document(doc, plan, pattern, field_values))
+    measure("save", lambda: doc.save(io.BytesIO()))
+    for engine in ENGINE_STAGES:
+        measure(engine, lambda: document_engine.render_document(template_path, field_values, engine))
+    return peaks
+
+
+def benchmark(templates, repeat):
+    """Mediana (ms) e pico de memória (KiB) por etapa, por modelo"""
+    results = {}
+    for template_path, field_values in templates:
+        pattern = document_engine.compile_placeholder_pattern(field_values)
+        # Aquecimento: índice e cache de modelos carregados antes das medições
+        document_engine.render_document(template_path, field_values)
+
+        runs = [run_stages(template_path, field_values, pattern) for _ in range(repeat)]
+        peaks = peak_memory(template_path, field_values, pattern)
+        results[os.path.basename(template_path)] = {
+            stage: {"ms": round(statistics.median(run[stage] for run in runs) * 1000, 3),
+                    "peak_kib": round(peaks[stage] / 1024, 1) if stage in peaks else None}
+            for stage in STAGES + ENGINE_STAGES
+        }
+    return results
+
+
+def print_report(results):
+    columns = STAGES + ENGINE_STAGES
+    name_width = max(len(name) for name in results) + 2
+    print("Mediana por etapa (ms):")
+    print("".ljust(name_width) + "".join(stage.rjust(20) for stage in columns))
+    for name, stages in results.items():
+        print(name.ljust(name_width) + "".join(f"{stages[stage]['ms']:20.2f}" for stage in columns))
+
+    print("\nPico de memória por etapa (KiB):")
+    print("".ljust(name_width) + "".join(stage.rjust(20) for stage in columns))
+    for name, stages in results.items():
+        print(name.ljust(name_width) + "".join(
+            (f"{stages[stage]['peak_kib']:20.1f}" if stages[stage]['peak_kib'] is not None else "-".rjust(20))
+            for stage in columns))
+
+
+def compare(results, baseline, tolerance):
+    """Lista as etapas mais lentas que a referência além da tolerância (fração)"""
+    regressions = []
+    for name, stages in results.items():
+        for stage, values in stages.items():
+            reference = baseline.get(name, {}).get(stage, {}).get("ms")
+            if reference and values["ms"] > reference * (1 + tolerance):
+                regressions.append(f"{name} / {stage}: {reference:.2f} ms -> {values['ms']:.2f} ms")
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Mede o tempo de cada etapa da geração dos documentos.")
+    parser.add_argument("--templates", default="templates", help="Diretório com os modelos .docx")
+    parser.add_argument("--config", default="config", help="Diretório com os modelos *_modelo.json")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetições por modelo (mediana)")
+    parser.add_argument("--no-stress", dest="stress", action="store_false",
+                        help="Não gera os modelos sintéticos de estresse")
+    parser.add_argument("--json", help="Grava o resultado em um arquivo JSON")
+    parser.add_argument("--compare", help="Resultado JSON de referência para detectar regressões")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Aumento tolerado em relação à referência (padrão: 0.25 = 25%%)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix="benchmark_docs_") as stress_dir:
+        templates = real_templates(args.templates, args.config)
+        if args.stress:
+            templates += build_stress_templates(stress_dir)
+        if not templates:
+            print("Erro: nenhum modelo encontrado.", file=sys.stderr)
+            return 2
+        results = benchmark(templates, args.repeat)
+        # Os índices dos modelos sintéticos ficam junto a eles e somem com o diretório
+
+    print_report(results)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressões:\n- " + "\n- ".join(regressions))
+            return 1
+        print("\nNenhuma regressão em relação à referência.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
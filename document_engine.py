@@ -0,0 +1,1164 @@
+import os
+import copy
+import hashlib
+import io
+import json
+import re
+import shutil
+import struct
+import sys
+import time
+import zipfile
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import datetime
+
+# O python-docx (e o lxml) é importado sob demanda, na primeira geração: a
+# interface e a descoberta de modelos não dependem dele (ver _docx()).
+
+# Chaves usadas para identificar o aluno no nome dos arquivos gerados
+STUDENT_NAME_KEYS = ("[nome do aluno]", "[nome_aluno]", "[NOME_ALUNO]")
+
+# Partes do pacote .docx com texto ("stories") que recebem substituições e por
+# isso são clonadas a cada preenchimento: corpo, todos os cabeçalhos e rodapés
+# (padrão, primeira página, páginas pares), notas de rodapé/fim e comentários
+_WML = "application/vnd.openxmlformats-officedocument.wordprocessingml."
+STORY_CONTENT_TYPES = (_WML + "document.main+xml", _WML + "header+xml", _WML + "footer+xml",
+                       _WML + "footnotes+xml", _WML + "endnotes+xml", _WML + "comments+xml")
+
+# Tag dos parágrafos (w:p) no namespace principal do WordprocessingML
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+W_P = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}p"
+W_T = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}t"
+W_RPR = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}rPr"
+
+# Runs de um parágrafo que compõem o texto visível: diretas e dentro de
+# hyperlinks, revisões inseridas, smart tags, campos simples e controles de conteúdo.
+# As runs de caixas de texto ficam nos seus próprios w:p, visitados separadamente.
+PARAGRAPH_RUNS_XPATH = ("./w:r | ./w:hyperlink/w:r | ./w:ins/w:r | ./w:smartTag/w:r"
+                        " | ./w:fldSimple/w:r | ./w:sdt/w:sdtContent/w:r")
+
+# Formato genérico de um placeholder nos modelos: texto entre colchetes
+PLACEHOLDER_RE = re.compile(r"\[[^\[\]\r\n]+\]")
+
+# Versão do índice de placeholders (.idx.json); alterar invalida os índices já gravados
+INDEX_VERSION = 2
+INDEX_SUFFIX = ".idx.json"
+
+
+_docx_module = None
+
+
+def _docx():
+    """Importa o python-docx na primeira utilização"""
+    global _docx_module
+    if _docx_module is None:
+        import docx
+        _docx_module = docx
+    return _docx_module
+
+
+def compile_placeholder_pattern(field_values):
+    """
+    Compila uma única expressão regular com todos os placeholders (alternância).
+    As chaves mais longas vêm primeiro para que '[horário_término]' tenha
+    prioridade sobre '[horário]' em posições sobrepostas.
+    """
+    keys = sorted((k for k in field_values if k), key=len, reverse=True)
+    if not keys:
+        return None
+    return re.compile("|".join(re.escape(k) for k in keys))
+
+
+def replace_placeholders_preserve_formatting(runs, pattern, field_values):
+    """
+    Substitui todos os placeholders de um parágrafo em uma única passada.
+    Os offsets das runs são calculados uma vez e as substituições são aplicadas
+    de trás para frente; cada run alterada é reescrita uma única vez, e o novo
+    texto fica na primeira run afetada (mantendo a formatação dela).
+    """
+    if pattern is None:
+        return False
+
+    texts = [run.text for run in runs]
+    full_text = "".join(texts)
+    matches = list(pattern.finditer(full_text))
+    if not matches:
+        return False
+
+    # Offsets de início e fim de cada run no texto completo
+    starts = []
+    ends = []
+    current_pos = 0
+    for text in texts:
+        starts.append(current_pos)
+        current_pos += len(text)
+        ends.append(current_pos)
+
+    new_texts = list(texts)
+    for match in reversed(matches):
+        start_pos, end_pos = match.span()
+        new_part = field_values[match.group()]
+
+        # Primeira run que termina depois do início da ocorrência
+        idx = bisect_right(ends, start_pos)
+        while idx < len(runs) and starts[idx] < end_pos:
+            text = new_texts[idx]
+            rel_start = max(0, start_pos - starts[idx])
+            rel_end = min(len(text), end_pos - starts[idx])
+            new_texts[idx] = text[:rel_start] + new_part + text[rel_end:]
+            new_part = ""  # Apenas a primeira run afetada recebe o novo texto
+            idx += 1
+
+    for run, old_text, new_text in zip(runs, texts, new_texts):
+        if new_text != old_text:
+            run.text = new_text
+
+    return True
+
+
+_paragraph_runs_xpath = None
+
+
+def paragraph_runs(p):
+    """Runs de texto de um w:p, em ordem do documento"""
+    global _paragraph_runs_xpath
+    if _paragraph_runs_xpath is None:
+        # Compilada uma vez: BaseOxmlElement.xpath recria o mapa de namespaces a cada chamada
+        from lxml import etree
+        _paragraph_runs_xpath = etree.XPath(PARAGRAPH_RUNS_XPATH, namespaces={"w": W_NS})
+    return _paragraph_runs_xpath(p)
+
+
+def _load_note_parts(package, note_parts):
+    """
+    O python-docx carrega as notas de rodapé/fim como partes binárias (Part), sem
+    XML. Troca cada uma, apenas neste pacote, por um XmlPart criado a partir do
+    conteúdo dela e refaz as relações que apontavam para a parte original; o
+    registro global de tipos do python-docx (PartFactory) não é alterado.
+    """
+    from docx.opc.part import XmlPart
+
+    replacements = {}
+    for part in note_parts:
+        xml_part = XmlPart.load(part.partname, part.content_type, part.blob, package)
+        for rId, rel in part.rels.items():
+            xml_part.load_rel(rel.reltype, rel.target_ref if rel.is_external else rel.target_part,
+                              rId, rel.is_external)
+        replacements[id(part)] = xml_part
+
+    for source in [package, *package.iter_parts()]:
+        for rId, rel in list(source.rels.items()):
+            if not rel.is_external and id(rel.target_part) in replacements:
+                source.load_rel(rel.reltype, replacements[id(rel.target_part)], rId)
+
+
+def iter_story_parts(package):
+    """Partes de texto do pacote (cada uma uma única vez)"""
+    from docx.opc.part import XmlPart
+
+    parts = [part for part in package.iter_parts() if part.content_type in STORY_CONTENT_TYPES]
+    note_parts = [part for part in parts if not isinstance(part, XmlPart)]
+    if note_parts:
+        _load_note_parts(package, note_parts)
+        parts = [part for part in package.iter_parts() if part.content_type in STORY_CONTENT_TYPES]
+
+    for part in parts:
+        if isinstance(part, XmlPart):
+            yield part
+
+
+def iter_story_paragraphs(doc):
+    """
+    Percorre a árvore XML de todas as partes de texto do documento, visitando
+    cada w:p exatamente uma vez: corpo, tabelas aninhadas, caixas de texto,
+    cabeçalhos e rodapés de todos os tipos, notas e comentários.
+    Gera (parte, posição, w:p), onde posição é o índice do parágrafo na ordem
+    de part.element.iter('w:p').
+    """
+    for part in iter_story_parts(doc.part.package):
+        for position, p in enumerate(part.element.iter(W_P)):
+            yield part, position, p
+
+
+def compile_template_index(doc, sha256=None):
+    """
+    Mapa de placeholders do modelo: para cada placeholder, a lista de ocorrências
+    [parte, posição do parágrafo, primeira run, última run].
+    """
+    placeholders = {}
+    for part, position, p in iter_story_paragraphs(doc):
+        if "[" not in "".join(p.itertext(W_T)):
+            continue
+        texts = [r.text for r in paragraph_runs(p)]
+        full_text = "".join(texts)
+        if "[" not in full_text:
+            continue
+
+        ends = []
+        current_pos = 0
+        for text in texts:
+            current_pos += len(text)
+            ends.append(current_pos)
+
+        for match in PLACEHOLDER_RE.finditer(full_text):
+            first_run = bisect_right(ends, match.start())
+            last_run = bisect_right(ends, match.end() - 1)
+            placeholders.setdefault(match.group(), []).append(
+                [str(part.partname), position, first_run, last_run])
+
+    return {"version": INDEX_VERSION, "sha256": sha256, "placeholders": placeholders}
+
+
+def load_template_index(template_path, doc=None):
+    """
+    Lê o índice gravado ao lado do modelo (<modelo>.docx.idx.json) se ele
+    corresponder ao arquivo atual: pela data de modificação e tamanho gravados
+    no índice ou, se só esses mudaram, pelo hash do conteúdo. Caso contrário
+    recompila a partir de doc (ainda não preenchido, carregado do modelo se
+    omitido) e tenta regravá-lo.
+    """
+    stat = os.stat(template_path)
+    index_path = template_path + INDEX_SUFFIX
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get("version") != INDEX_VERSION:
+            index = None
+    except (OSError, ValueError):
+        index = None
+    if index is not None and index.get("mtime_ns") == stat.st_mtime_ns and index.get("size") == stat.st_size:
+        return index
+
+    with open(template_path, 'rb') as f:
+        sha256 = hashlib.sha256(f.read()).hexdigest()
+
+    if index is None or index.get("sha256") != sha256:
+        if doc is None:
+            doc = _docx().Document(template_path)
+        index = compile_template_index(doc, sha256)
+    index.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+    try:
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp_path, index_path)
+    except OSError:
+        pass  # Diretório de modelos somente leitura: o índice fica apenas em memória
+
+    return index
+
+
+# Índices já lidos neste processo, por caminho: (caminho, mtime, tamanho) -> índice
+_index_memo = {}
+
+
+def template_index(template_path, doc=None):
+    """Índice de placeholders do modelo, lido uma vez por processo enquanto o arquivo não mudar"""
+    path = os.path.abspath(template_path)
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+
+    memo = _index_memo.get(path)
+    if memo is not None and memo[0] == key:
+        return memo[1]
+
+    index = load_template_index(path, doc)
+    _index_memo[path] = (key, index)
+    return index
+
+
+def check_template_config(index, campos):
+    """
+    Compara os placeholders do modelo com os campos do modelo JSON.
+    Retorna (placeholders sem campo no JSON, campos do JSON ausentes no modelo).
+    """
+    placeholders = index["placeholders"]
+    sem_campo = sorted(key for key in placeholders if key not in campos)
+    sem_placeholder = sorted(key for key in campos if key not in placeholders)
+    return sem_campo, sem_placeholder
+
+
+def describe_template_mismatches(doc_name, index, campos):
+    """Texto com as divergências entre modelo .docx e modelo JSON ('' se não houver)"""
+    sem_campo, sem_placeholder = check_template_config(index, campos)
+    linhas = []
+    if sem_campo:
+        linhas.append(f"{doc_name}: placeholders sem campo no JSON: {', '.join(sem_campo)}")
+    if sem_placeholder:
+        linhas.append(f"{doc_name}: campos do JSON ausentes no modelo: {', '.join(sem_placeholder)}")
+    return "\n".join(linhas)
+
+
+def _indexed_paragraphs(doc, index, field_values):
+    """Apenas os parágrafos que contêm algum dos placeholders a preencher"""
+    wanted = {}
+    for key in field_values:
+        for partname, position, _, _ in index["placeholders"].get(key, ()):
+            wanted.setdefault(partname, set()).add(position)
+
+    for part in iter_story_parts(doc.part.package):
+        positions = wanted.get(str(part.partname))
+        if not positions:
+            continue
+        last = max(positions)
+        for i, p in enumerate(part.element.iter(W_P)):
+            if i in positions:
+                yield p
+            if i >= last:
+                break
+
+
+def fill_document(doc, pattern, field_values, index=None):
+    """
+    Substitui os placeholders em todas as partes de texto do documento.
+    Com o índice do modelo, visita apenas os parágrafos que contêm placeholders.
+    """
+    # O índice só conhece chaves no formato [texto]; outras exigem a varredura completa
+    if index is not None and all(PLACEHOLDER_RE.fullmatch(key) for key in field_values):
+        paragraphs = _indexed_paragraphs(doc, index, field_values)
+    else:
+        paragraphs = (p for _, _, p in iter_story_paragraphs(doc))
+
+    for p in paragraphs:
+        replace_placeholders_preserve_formatting(paragraph_runs(p), pattern, field_values)
+
+
+def _is_plain_run(r):
+    """Run só com formatação e texto (sem tabulações, quebras, campos, imagens...)"""
+    return all(child.tag in (W_RPR, W_T) for child in r)
+
+
+def _run_format(r):
+    from lxml import etree
+
+    rpr = r.find(W_RPR)
+    return b"" if rpr is None else etree.tostring(rpr)
+
+
+def normalize_paragraph(p):
+    """
+    Normaliza as runs de um parágrafo do modelo, uma única vez:
+    1. junta runs vizinhas só de texto com a mesma formatação (w:rPr);
+    2. reúne cada placeholder dividido em várias runs na primeira delas, como
+       faria o preenchimento (o texto fica com a formatação da primeira run);
+    3. separa cada placeholder em uma run própria, com a mesma formatação.
+    Retorna (exato, reunidos): exato indica que todo placeholder do parágrafo
+    ficou sozinho em uma run (os que passam por runs com outro conteúdo são
+    mantidos como estão); reunidos são os placeholders cuja formatação mudou no
+    passo 2, o que só equivale ao preenchimento se eles forem substituídos.
+    """
+    runs = paragraph_runs(p)
+    if "[" not in "".join(r.text for r in runs):
+        return True, set()
+
+    # 1. Runs vizinhas (mesmo pai) com formatação idêntica
+    merged = [runs[0]]
+    for r in runs[1:]:
+        prev = merged[-1]
+        if (prev.getnext() is r and _is_plain_run(prev) and _is_plain_run(r)
+                and _run_format(prev) == _run_format(r)):
+            prev.text = prev.text + r.text
+            r.getparent().remove(r)
+        else:
+            merged.append(r)
+    runs = merged
+
+    # 2. Placeholders divididos em várias runs só de texto
+    texts = [r.text for r in runs]
+    ends = []
+    current_pos = 0
+    for text in texts:
+        current_pos += len(text)
+        ends.append(current_pos)
+
+    new_texts = list(texts)
+    coalesced = set()
+    for match in reversed(list(PLACEHOLDER_RE.finditer("".join(texts)))):
+        first_run = bisect_right(ends, match.start())
+        last_run = bisect_right(ends, match.end() - 1)
+        if first_run == last_run or not all(_is_plain_run(r) for r in runs[first_run:last_run + 1]):
+            continue
+        coalesced.add(match.group())
+        for idx in range(first_run, last_run + 1):
+            start = ends[idx] - len(texts[idx])
+            rel_start = max(0, match.start() - start)
+            rel_end = min(len(texts[idx]), match.end() - start)
+            text = new_texts[idx]
+            new_texts[idx] = text[:rel_start] + (match.group() if idx == first_run else "") + text[rel_end:]
+
+    for r, old_text, new_text in zip(runs, texts, new_texts):
+        if new_text != old_text:
+            if new_text:
+                r.text = new_text
+            else:
+                r.getparent().remove(r)
+
+    # 3. Cada placeholder em uma run própria
+    exact = True
+    for r in paragraph_runs(p):
+        text = r.text
+        matches = list(PLACEHOLDER_RE.finditer(text))
+        if not matches or (len(matches) == 1 and matches[0].group() == text):
+            continue
+        if not _is_plain_run(r):
+            exact = False
+            continue
+
+        segments = []
+        pos = 0
+        for match in matches:
+            segments += [text[pos:match.start()], match.group()]
+            pos = match.end()
+        segments.append(text[pos:])
+
+        anchor = r
+        for segment in [s for s in segments if s]:
+            new_run = copy.deepcopy(r)
+            new_run.text = segment
+            anchor.addnext(new_run)
+            anchor = new_run
+        r.getparent().remove(r)
+
+    # Placeholders que ainda atravessam runs (com tabulações, campos...)
+    for r in paragraph_runs(p):
+        text = r.text
+        if "[" in text or "]" in text:
+            matches = list(PLACEHOLDER_RE.finditer(text))
+            if not (len(matches) == 1 and matches[0].group() == text):
+                exact = False
+    return exact, coalesced
+
+
+def normalize_document(doc):
+    """
+    Normaliza todas as partes de texto do modelo (normalize_paragraph) e
+    devolve o plano de preenchimento: o índice do documento normalizado, o
+    conjunto de (parte, posição) dos parágrafos que exigem a substituição por
+    expressão regular e, para os parágrafos com placeholders reunidos, esses
+    placeholders e uma cópia do parágrafo original.
+    """
+    inexact = set()
+    originals = {}
+    for part, position, p in iter_story_paragraphs(doc):
+        # Filtro rápido (texto dos w:t, em C) antes de montar o texto das runs
+        if "[" not in "".join(p.itertext(W_T)):
+            continue
+        original = copy.deepcopy(p)
+        exact, coalesced = normalize_paragraph(p)
+        if not exact:
+            inexact.add((str(part.partname), position))
+        if coalesced:
+            originals[(str(part.partname), position)] = (coalesced, original)
+    return {"placeholders": compile_template_index(doc)["placeholders"], "inexact": inexact,
+            "originals": originals}
+
+
+def fill_normalized_document(doc, plan, pattern, field_values):
+    """
+    Preenche um documento normalizado: cada placeholder já está sozinho em uma
+    run, então a substituição é uma consulta ao dicionário por run, sem cálculo
+    de offsets. Parágrafos não normalizáveis usam a substituição por expressão
+    regular; chaves fora do formato [texto] usam a varredura completa.
+    Parágrafos com placeholders reunidos que não serão preenchidos voltam ao
+    original antes da substituição, mantendo a formatação de quem não é campo.
+    """
+    # parte -> posição -> [(run, chave)]; None marca parágrafo a substituir por regex
+    wanted = {}
+    restore = {}
+    for (partname, position), (coalesced, original) in plan["originals"].items():
+        if not coalesced.issubset(field_values):
+            restore[(partname, position)] = original
+            wanted.setdefault(partname, {})[position] = None
+
+    if not all(PLACEHOLDER_RE.fullmatch(key) for key in field_values):
+        _restore_paragraphs(doc, restore)
+        fill_document(doc, pattern, field_values)
+        return
+
+    for key in field_values:
+        for partname, position, first_run, _ in plan["placeholders"].get(key, ()):
+            runs = wanted.setdefault(partname, {})
+            if (partname, position) in plan["inexact"]:
+                runs[position] = None
+            elif runs.get(position, ()) is not None:
+                runs.setdefault(position, []).append((first_run, key))
+
+    for part in iter_story_parts(doc.part.package):
+        positions = wanted.get(str(part.partname))
+        if not positions:
+            continue
+        paragraphs = list(part.element.iter(W_P))
+        restored_until = -1
+        for i in sorted(positions):
+            p = paragraphs[i]
+            targets = positions[i]
+            original = restore.get((str(part.partname), i))
+            if original is not None:
+                p = _replace_paragraph(p, original)
+                # Parágrafos aninhados (caixas de texto) também voltaram ao original
+                paragraphs = list(part.element.iter(W_P))
+                restored_until = max(restored_until, i + sum(1 for _ in p.iter(W_P)) - 1)
+            if targets is None or i <= restored_until:
+                replace_placeholders_preserve_formatting(paragraph_runs(p), pattern, field_values)
+            else:
+                runs = paragraph_runs(p)
+                for run_index, key in targets:
+                    runs[run_index].text = field_values[key]
+
+
+def _replace_paragraph(p, original):
+    """Troca p por uma cópia do parágrafo original (antes da normalização)"""
+    new_p = copy.deepcopy(original)
+    p.addnext(new_p)
+    p.getparent().remove(p)
+    return new_p
+
+
+def _restore_paragraphs(doc, restore):
+    for part in iter_story_parts(doc.part.package):
+        paragraphs = list(part.element.iter(W_P))
+        for (partname, position), original in restore.items():
+            if partname == str(part.partname):
+                _replace_paragraph(paragraphs[position], original)
+
+
+class _CachedTemplate:
+    """
+    Modelo já carregado e normalizado (normalize_document), com uma cópia
+    intacta do XML de cada parte de texto e o plano de preenchimento
+    """
+
+    def __init__(self, key, path):
+        self.key = key
+        self.document = _docx().Document(path)
+        self.story_parts = list(iter_story_parts(self.document.part.package))
+        # Índice do arquivo original (usado também pelo preenchimento direto no XML)
+        self.index = template_index(path, self.document)
+        self.plan = normalize_document(self.document)
+        self.pristine = [copy.deepcopy(part.element) for part in self.story_parts]
+
+        # Estimativa de memória: tamanho descompactado das partes do pacote
+        with zipfile.ZipFile(path) as zf:
+            self.size = sum(info.file_size for info in zf.infolist())
+
+    def checkout(self):
+        """
+        Devolve um Document pronto para ser preenchido, com cópias novas do XML
+        das partes de texto. As demais partes (estilos, imagens...) são compartilhadas
+        e não são alteradas pelo preenchimento.
+        """
+        for part, element in zip(self.story_parts, self.pristine):
+            part._element = copy.deepcopy(element)
+        return self.document.part.document
+
+
+class TemplateCache:
+    """
+    Cache LRU de modelos .docx já interpretados, por processo.
+    A entrada é invalidada quando o caminho, a data de modificação ou o tamanho
+    do arquivo mudam; as entradas menos usadas são descartadas ao exceder
+    max_entries ou max_bytes (estimativa do XML descompactado).
+    """
+
+    def __init__(self, max_entries=32, max_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path):
+        """Document pronto para preenchimento do modelo em path"""
+        return self._entry(path).checkout()
+
+    def get_index(self, path):
+        """Índice de placeholders do modelo em path"""
+        return self._entry(path).index
+
+    def get_normalized(self, path):
+        """(Document normalizado pronto para preenchimento, plano de preenchimento)"""
+        entry = self._entry(path)
+        return entry.checkout(), entry.plan
+
+    def _entry(self, path):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+
+        entry = self._entries.get(path)
+        if entry is not None and entry.key == key:
+            self._entries.move_to_end(path)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        if entry is not None:
+            self._discard(path)
+        entry = _CachedTemplate(key, path)
+        self._entries[path] = entry
+        self._total_bytes += entry.size
+        self._evict(keep=path)
+        return entry
+
+    def clear(self):
+        self._entries.clear()
+        self._total_bytes = 0
+
+    def _discard(self, path):
+        entry = self._entries.pop(path)
+        self._total_bytes -= entry.size
+
+    def _evict(self, keep):
+        while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                break
+            self._discard(oldest)
+
+
+# Cache do processo atual (cada processo do pool mantém o seu)
+template_cache = TemplateCache()
+
+
+# Registro opcional do tempo de cada etapa por documento gerado:
+# AUTOMATIC_DOCS_STAGE_TIMINGS=1 (ou --stage-timings na interface) grava uma linha
+# JSON por documento em STAGE_TIMINGS_LOG, inclusive a partir dos processos do pool
+STAGE_TIMINGS_ENV = "AUTOMATIC_DOCS_STAGE_TIMINGS"
+
+
+def stage_timings_log():
+    return os.path.join(cache_dir(), "stage_timings.jsonl")
+
+
+class StageTimer:
+    """Mede a duração das etapas da geração de um documento (custo desprezível quando desativado)"""
+
+    def __init__(self, engine, template_path):
+        self.engine = engine
+        self.template = os.path.basename(template_path)
+        self.stages = {}
+        self._last = time.perf_counter()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self._last)
+        self._last = now
+
+    def log(self):
+        """Acrescenta as durações ao registro, se o modo de medição estiver ativo"""
+        if not os.environ.get(STAGE_TIMINGS_ENV):
+            return
+        line = json.dumps({"time": datetime.now().isoformat(timespec="seconds"), "pid": os.getpid(),
+                           "engine": self.engine, "template": self.template,
+                           "stages_ms": {k: round(v * 1000, 3) for k, v in self.stages.items()}},
+                          ensure_ascii=False)
+        try:
+            os.makedirs(cache_dir(), exist_ok=True)
+            with open(stage_timings_log(), 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+        except OSError:
+            pass
+
+
+def generate_document(template_path, field_values, output_path, pattern=None):
+    """Preenche uma cópia do modelo (via cache) e salva o documento em output_path"""
+    timer = StageTimer("docx", template_path)
+    if pattern is None:
+        pattern = compile_placeholder_pattern(field_values)
+
+    doc, plan = template_cache.get_normalized(template_path)
+    timer.mark("load")
+    fill_normalized_document(doc, plan, pattern, field_values)
+    timer.mark("replace")
+    doc.save(output_path)
+    timer.mark("save")
+    timer.log()
+    return output_path
+
+
+# A cópia sem recompactação escreve direto no ZipFile usando estado interno do
+# módulo zipfile (fp, filelist, NameToInfo, start_dir, _didModify e
+# ZipInfo.FileHeader), estável no CPython 3 mas não documentado. Se algum desses
+# atributos faltar, ou o membro exigir ZIP64, estiver criptografado ou usar
+# descritor de dados, o membro é copiado pela API pública (descompacta e recompacta).
+_ZIP_RAW_COPY_ATTRS = ("fp", "filelist", "NameToInfo", "start_dir", "_didModify")
+
+
+def _can_copy_zip_member_raw(zin, zout, info):
+    return (all(hasattr(zout, attr) for attr in _ZIP_RAW_COPY_ATTRS)
+            and hasattr(zin, "fp") and hasattr(info, "FileHeader")
+            and not info.flag_bits & 0x09  # Criptografado (0x01) ou com descritor de dados (0x08)
+            and max(info.file_size, info.compress_size, info.header_offset,
+                    zout.fp.tell()) < zipfile.ZIP64_LIMIT)
+
+
+def _copy_zip_member_raw(zin, zout, info):
+    """
+    Copia um membro de zin para zout com os bytes já compactados, sem
+    descompactar/recompactar. O cabeçalho local é regravado a partir do ZipInfo
+    (com CRC e tamanhos conhecidos). Fora dos casos suportados, recai em
+    zout.writestr com o conteúdo lido de zin.
+    """
+    if not _can_copy_zip_member_raw(zin, zout, info):
+        zout.writestr(copy.copy(info), zin.read(info))
+        return
+
+    zin.fp.seek(info.header_offset)
+    local_header = zin.fp.read(30)
+    name_length, extra_length = struct.unpack('<HH', local_header[26:30])
+    zin.fp.seek(info.header_offset + 30 + name_length + extra_length)
+    data = zin.fp.read(info.compress_size)
+
+    new_info = copy.copy(info)
+    new_info.header_offset = zout.fp.tell()
+    zout.fp.write(new_info.FileHeader())
+    zout.fp.write(data)
+
+    zout.filelist.append(new_info)
+    zout.NameToInfo[new_info.filename] = new_info
+    zout.start_dir = zout.fp.tell()
+    zout._didModify = True
+
+
+def stream_generate_document(template_path, field_values, output_path, pattern=None):
+    """
+    Caminho alternativo de preenchimento direto no XML, sem montar o pacote do
+    python-docx: apenas as partes com placeholders a preencher (segundo o índice
+    do modelo) são interpretadas e regravadas; os demais membros do .docx são
+    copiados byte a byte. O texto e a formatação das runs resultantes são os mesmos
+    do caminho com Document (os bytes do XML podem diferir: o python-docx regrava
+    também as partes que não foram alteradas).
+    """
+    # O índice só conhece chaves no formato [texto]; outras exigem o caminho completo
+    if not all(PLACEHOLDER_RE.fullmatch(key) for key in field_values):
+        return generate_document(template_path, field_values, output_path, pattern)
+
+    timer = StageTimer("xml", template_path)
+    if pattern is None:
+        pattern = compile_placeholder_pattern(field_values)
+
+    _docx()
+    from docx.opc.oxml import serialize_part_xml
+    from docx.oxml.parser import parse_xml
+
+    # Posições dos parágrafos a preencher, por membro do zip
+    wanted = {}
+    for key in field_values:
+        for partname, position, _, _ in template_index(template_path)["placeholders"].get(key, ()):
+            wanted.setdefault(partname.lstrip('/'), set()).add(position)
+    timer.mark("index")
+
+    with zipfile.ZipFile(template_path) as zin, \
+            zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zout:
+        for info in zin.infolist():
+            positions = wanted.get(info.filename)
+            if not positions:
+                _copy_zip_member_raw(zin, zout, info)
+                timer.mark("save")
+                continue
+
+            root = parse_xml(zin.read(info))
+            timer.mark("load")
+            last = max(positions)
+            for i, p in enumerate(root.iter(W_P)):
+                if i in positions:
+                    replace_placeholders_preserve_formatting(paragraph_runs(p), pattern, field_values)
+                if i >= last:
+                    break
+            timer.mark("replace")
+
+            new_info = zipfile.ZipInfo(info.filename, info.date_time)
+            new_info.compress_type = zipfile.ZIP_DEFLATED
+            new_info.external_attr = info.external_attr
+            zout.writestr(new_info, serialize_part_xml(root))
+            timer.mark("save")
+
+    timer.log()
+    return output_path
+
+
+# Mecanismos de preenchimento disponíveis
+ENGINES = {
+    "docx": generate_document,
+    "xml": stream_generate_document,
+}
+
+
+def render_document(template_path, field_values, engine="docx"):
+    """
+    Gera o documento em memória e retorna os bytes do .docx, para gravá-lo
+    direto em um ZIP (write_zip_member) sem passar por um arquivo temporário
+    """
+    buffer = io.BytesIO()
+    ENGINES[engine](template_path, field_values, buffer)
+    return buffer.getvalue()
+
+
+def write_zip_member(zip_file, arcname, data):
+    """Grava um documento gerado no ZIP sem recompactar (o .docx já é compactado)"""
+    info = zipfile.ZipInfo(arcname, datetime.now().timetuple()[:6])
+    info.compress_type = zipfile.ZIP_STORED
+    info.external_attr = 0o644 << 16
+    zip_file.writestr(info, data)
+
+
+def timed_call(func, *args):
+    """Executa func(*args) e retorna (resultado, segundos), medindo a tarefa no próprio processo do pool"""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def output_filename(doc_name, field_values):
+    """Nome do arquivo de saída: <modelo>_<nome do aluno>.docx"""
+    base_name = os.path.splitext(doc_name)[0]
+    nome_aluno = ""
+    for key in STUDENT_NAME_KEYS:
+        nome_aluno = str(field_values.get(key, "")).strip().replace(" ", "_")
+        if nome_aluno:
+            break
+    if not nome_aluno:
+        nome_aluno = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    return f"{base_name}_{nome_aluno}.docx"
+
+
+def config_name_for(doc_name):
+    """Nome do modelo JSON correspondente a um arquivo .docx"""
+    return f"{os.path.splitext(doc_name)[0]}.json"
+
+
+# Tipos de campo aceitos nos modelos JSON (o padrão da interface é 'radio')
+FIELD_TYPES = ("texto", "radio", "data")
+
+# Diretório dos caches persistentes (manifesto de modelos, documentos gerados etc.);
+# AUTOMATIC_DOCS_CACHE_DIR substitui o local padrão, ao lado do aplicativo
+CACHE_DIR_ENV = "AUTOMATIC_DOCS_CACHE_DIR"
+CACHE_DIRNAME = ".automatic_docs_cache"
+MANIFEST_VERSION = 1
+
+
+def cache_dir():
+    """
+    Diretório dos caches, resolvido a cada uso (e não na importação): o da variável
+    AUTOMATIC_DOCS_CACHE_DIR ou, sem ela, a pasta do executável do PyInstaller ou deste
+    módulo, independente do diretório de trabalho de quem iniciou o programa
+    """
+    configured = os.environ.get(CACHE_DIR_ENV)
+    if configured:
+        return os.path.abspath(configured)
+    if getattr(sys, "frozen", False):
+        app_dir = os.path.dirname(sys.executable)
+    else:
+        app_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(app_dir, CACHE_DIRNAME)
+
+
+def validate_model_schema(json_data):
+    """Valida a estrutura de um modelo *_modelo.json. Retorna a lista de problemas"""
+    if not isinstance(json_data, dict) or not isinstance(json_data.get('campos'), dict):
+        return ["chave 'campos' ausente ou inválida"]
+
+    problemas = []
+    for field_key, field_info in json_data['campos'].items():
+        if not isinstance(field_info, dict):
+            problemas.append(f"{field_key}: definição do campo deve ser um objeto")
+            continue
+        if not isinstance(field_info.get('rotulo'), str):
+            problemas.append(f"{field_key}: 'rotulo' ausente")
+        if field_info.get('tipo', 'radio') not in FIELD_TYPES:
+            problemas.append(f"{field_key}: tipo desconhecido '{field_info.get('tipo')}'")
+        opcoes = field_info.get('opcoes', [])
+        if not isinstance(opcoes, list) or not all(isinstance(o, str) for o in opcoes):
+            problemas.append(f"{field_key}: 'opcoes' deve ser uma lista de textos")
+        if not isinstance(field_info.get('obrigatorio', False), bool):
+            problemas.append(f"{field_key}: 'obrigatorio' deve ser true ou false")
+    return problemas
+
+
+def model_schema_warnings(json_data):
+    """Problemas de um modelo já válido que não impedem o uso (a interface aplica um padrão)"""
+    return [f"{field_key}: campo do tipo radio sem opções definidas (serão usadas opções padrão)"
+            for field_key, field_info in json_data['campos'].items()
+            if field_info.get('tipo', 'radio') == 'radio' and not field_info.get('opcoes')]
+
+
+def _parse_model(raw, path):
+    """
+    Interpreta e valida o conteúdo (bytes) de um modelo JSON. Os avisos são
+    exibidos aqui, uma vez a cada leitura do conteúdo do modelo.
+    """
+    json_data = json.loads(raw.decode('utf-8-sig'))
+    problemas = validate_model_schema(json_data)
+    if problemas:
+        raise ValueError("modelo inválido:\n  - " + "\n  - ".join(problemas))
+    for aviso in model_schema_warnings(json_data):
+        print(f"Aviso em {os.path.basename(path)}: {aviso}")
+    return json_data
+
+
+def _read_model(path):
+    """Lê e valida um modelo JSON. Retorna (dados, hash do conteúdo)"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    return _parse_model(raw, path), hashlib.sha256(raw).hexdigest()
+
+
+def load_json_models(directory, documents_info=None):
+    """Carrega os modelos *_modelo.json válidos de um diretório"""
+    if documents_info is None:
+        documents_info = {}
+
+    for json_file in os.listdir(directory):
+        if json_file.endswith('_modelo.json'):
+            try:
+                documents_info[json_file] = _read_model(os.path.join(directory, json_file))[0]
+            except Exception as e:
+                print(f"Erro ao carregar {json_file}: {e}")
+
+    return documents_info
+
+
+class ModelManifest:
+    """
+    Manifesto persistente dos diretórios de modelos (.docx) e de configurações
+    (*_modelo.json). Guarda a listagem de cada diretório (com data de modificação
+    e tamanho dos arquivos) e os modelos JSON já validados, com data de
+    modificação, tamanho e hash. Na inicialização só os arquivos alterados são
+    lidos de novo; refresh() detecta mudanças para o modo de monitoramento.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(cache_dir(), "manifest.json")
+        self.templates_dir = None
+        self.dirs = {}
+        self.models = {}
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != MANIFEST_VERSION:
+            return
+        self.templates_dir = data.get("templates_dir")
+        self.dirs = data.get("dirs", {})
+        self.models = data.get("models", {})
+
+    def save(self):
+        """Grava o manifesto se houve alterações (falhas de escrita são ignoradas)"""
+        if not self._dirty:
+            return
+        data = {"version": MANIFEST_VERSION, "templates_dir": self.templates_dir,
+                "dirs": self.dirs, "models": self.models}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except OSError:
+            pass
+
+    def remember_templates_dir(self, templates_dir):
+        if templates_dir != self.templates_dir:
+            self.templates_dir = templates_dir
+            self._dirty = True
+
+    def list_dir(self, directory, suffix):
+        """
+        Arquivos do diretório terminados em suffix, em ordem alfabética.
+        A listagem é refeita apenas quando o diretório ou algum dos arquivos mudou.
+        """
+        directory = os.path.abspath(directory)
+        files = {}
+        for entry in os.scandir(directory):
+            if entry.is_file():
+                stat = entry.stat()
+                files[entry.name] = [stat.st_mtime_ns, stat.st_size]
+
+        if self.dirs.get(directory) != files:
+            self.dirs[directory] = files
+            self._dirty = True
+
+        return sorted(name for name in files if name.endswith(suffix))
+
+    def load_model(self, path):
+        """Modelo JSON validado, lido do disco apenas se o arquivo mudou"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        entry = self.models.get(path)
+        if entry is not None and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            return entry["data"]
+
+        # Arquivo apenas tocado (mesmo conteúdo): reaproveita o modelo já validado
+        with open(path, 'rb') as f:
+            raw = f.read()
+        sha256 = hashlib.sha256(raw).hexdigest()
+        if entry is None or entry["sha256"] != sha256:
+            entry = {"sha256": sha256, "data": _parse_model(raw, path)}
+        entry.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+        self.models[path] = entry
+        self._dirty = True
+        return entry["data"]
+
+    def load_json_models(self, directory, documents_info=None):
+        """Como load_json_models, mas usando os modelos já validados do manifesto"""
+        if documents_info is None:
+            documents_info = {}
+
+        for json_file in self.list_dir(directory, '_modelo.json'):
+            try:
+                documents_info[json_file] = self.load_model(os.path.join(directory, json_file))
+            except Exception as e:
+                print(f"Erro ao carregar {json_file}: {e}")
+
+        # Esquecer modelos que não existem mais
+        for path in [p for p in self.models if not os.path.exists(p)]:
+            del self.models[path]
+            self._dirty = True
+
+        return documents_info
+
+    def refresh(self, directories):
+        """Verifica se algum dos diretórios monitorados mudou desde a última listagem"""
+        changed = False
+        for directory in directories:
+            if directory and os.path.isdir(directory):
+                before = self.dirs.get(os.path.abspath(directory))
+                self.list_dir(directory, '')
+                changed = changed or before != self.dirs.get(os.path.abspath(directory))
+        return changed
+
+
+def find_missing_fields(fields, field_values):
+    """Retorna os rótulos dos campos obrigatórios sem valor preenchido"""
+    missing_fields = []
+    for field_key, field_info in fields.items():
+        if field_info.get('obrigatorio', False):
+            value = str(field_values.get(field_key, "")).strip()
+            # Datas incompletas ficam como "//" ou "dd//aaaa"
+            if not value or (field_info.get('tipo') == 'data' and '' in value.split('/')):
+                missing_fields.append(field_info['rotulo'])
+    return missing_fields
+
+
+# Cache de documentos gerados, endereçado pelo conteúdo: a chave combina o hash
+# do modelo com os valores dos campos que o modelo realmente usa
+OUTPUT_CACHE_VERSION = 2
+OUTPUT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+def output_cache_dir():
+    return os.path.join(cache_dir(), "outputs")
+
+
+def output_cache_key(template_path, field_values, engine="docx"):
+    """
+    Chave do documento gerado: hash do modelo e apenas os valores dos campos
+    referenciados por ele (segundo o índice), de modo que corrigir um campo só
+    invalida os documentos que o contêm. Chaves fora do formato [texto] não
+    aparecem no índice e entram sempre na chave.
+    """
+    index = template_index(template_path)
+    placeholders = index["placeholders"]
+    used = {key: str(value) for key, value in field_values.items()
+            if key in placeholders or not PLACEHOLDER_RE.fullmatch(key)}
+    data = json.dumps({"version": OUTPUT_CACHE_VERSION, "engine": engine,
+                       "template": index["sha256"], "values": used},
+                      sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def _output_cache_path(key):
+    return os.path.join(output_cache_dir(), key[:2], key + ".docx")
+
+
+def _store_cached_output(key, data=None, source_path=None):
+    """Guarda um documento no cache (gravação atômica; falhas de escrita são ignoradas)"""
+    cached = _output_cache_path(key)
+    try:
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        tmp_path = f"{cached}.{os.getpid()}.tmp"
+        if data is not None:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+        else:
+            shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, cached)
+    except OSError:
+        pass
+
+
+def _touch_cached_output(cached):
+    # Data de modificação como último uso, para o descarte em prune_output_cache
+    try:
+        os.utime(cached)
+    except OSError:
+        pass
+
+
+def cached_generate_document(template_path, field_values, output_path, engine="docx"):
+    """
+    Gera o documento como ENGINES[engine], reaproveitando o resultado anterior
+    quando nem o modelo nem os campos usados por ele mudaram. O documento em
+    cache é copiado (não vinculado), para que editar a saída não altere o cache.
+    Retorna (output_path, reconstruído).
+    """
+    key = output_cache_key(template_path, field_values, engine)
+    cached = _output_cache_path(key)
+    if os.path.exists(cached):
+        shutil.copyfile(cached, output_path)
+        _touch_cached_output(cached)
+        return output_path, False
+
+    ENGINES[engine](template_path, field_values, output_path)
+    _store_cached_output(key, source_path=output_path)
+    return output_path, True
+
+
+def cached_render_document(template_path, field_values, engine="docx"):
+    """Como render_document, com o cache de documentos gerados. Retorna (bytes, reconstruído)"""
+    key = output_cache_key(template_path, field_values, engine)
+    cached = _output_cache_path(key)
+    try:
+        with open(cached, 'rb') as f:
+            data = f.read()
+        _touch_cached_output(cached)
+        return data, False
+    except OSError:
+        pass
+
+    data = render_document(template_path, field_values, engine)
+    _store_cached_output(key, data=data)
+    return data, True
+
+
+def prune_output_cache(max_bytes=OUTPUT_CACHE_MAX_BYTES):
+    """Remove os documentos usados há mais tempo quando o cache passa de max_bytes"""
+    entries = []
+    total = 0
+    for dirpath, _, filenames in os.walk(output_cache_dir()):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+            total += stat.st_size
+
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
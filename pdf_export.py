@@ -0,0 +1,396 @@
+"""
+Exportação em PDF dos documentos gerados com o LibreOffice sem interface (headless).
+
+Um único `soffice --headless` fica escutando em um socket local durante toda a
+sessão e converte cada documento por UNO, sem abrir um processo por arquivo:
+- se o módulo `uno` puder ser importado por este Python, a conversão é feita aqui;
+- caso contrário (CPython comum, executável do PyInstaller), um cliente UNO próprio
+  (_UNO_CLIENT) roda como processo permanente no Python que acompanha o
+  LibreOffice (program/python) ou em um python3 do sistema que tenha `uno`, e
+  recebe os documentos pela entrada padrão.
+
+Sem nenhum Python com `uno`, não há como manter o LibreOffice aberto: os documentos
+da fila são agrupados (até BATCH_SIZE por pasta de saída) e cada grupo é convertido
+por uma chamada própria de `soffice --headless --convert-to pdf`, que abre e fecha o
+LibreOffice. O perfil de usuário é reaproveitado entre as chamadas, mas o processo não.
+
+A conversão roda em uma thread própria: `submit()` apenas enfileira o .docx e
+devolve um Future, de modo que o PDF de um documento é produzido enquanto os
+próximos ainda estão sendo preenchidos.
+"""
+import os
+import sys
+import json
+import time
+import queue
+import shutil
+import socket
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import Future
+
+# Máximo de documentos por chamada do soffice no modo sem UNO
+BATCH_SIZE = 20
+# Tempo máximo de espera para o LibreOffice aceitar conexões UNO (segundos)
+UNO_CONNECT_TIMEOUT = 30
+
+
+def find_soffice():
+    """Localiza o executável do LibreOffice (PATH ou locais padrão de instalação)"""
+    for name in ("soffice", "libreoffice"):
+        path = shutil.which(name)
+        if path:
+            return path
+
+    if os.name == 'nt':
+        candidates = [os.path.join(os.environ.get(var, ""), "LibreOffice", "program", "soffice.exe")
+                      for var in ("ProgramFiles", "ProgramFiles(x86)")]
+    elif sys.platform == 'darwin':
+        candidates = ["/Applications/LibreOffice.app/Contents/MacOS/soffice"]
+    else:
+        candidates = ["/usr/lib/libreoffice/program/soffice", "/opt/libreoffice/program/soffice"]
+
+    for path in candidates:
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+# Cliente UNO executado no Python do LibreOffice quando este Python não tem `uno`.
+# Argumentos: porta e tempo máximo de conexão. Recebe uma linha JSON por documento
+# ({"docx", "pdf"}) e responde uma linha JSON ({"seconds"} ou {"error"}).
+_UNO_CLIENT = r"""
+import sys, json, time
+import uno
+from com.sun.star.beans import PropertyValue
+
+def props(**kwargs):
+    result = []
+    for name, value in kwargs.items():
+        prop = PropertyValue()
+        prop.Name = name
+        prop.Value = value
+        result.append(prop)
+    return tuple(result)
+
+def reply(**kwargs):
+    sys.stdout.write(json.dumps(kwargs) + "\n")
+    sys.stdout.flush()
+
+port, timeout = int(sys.argv[1]), float(sys.argv[2])
+local_context = uno.getComponentContext()
+resolver = local_context.ServiceManager.createInstanceWithContext(
+    "com.sun.star.bridge.UnoUrlResolver", local_context)
+deadline = time.monotonic() + timeout
+while True:
+    try:
+        context = resolver.resolve(
+            "uno:socket,host=127.0.0.1,port=%d;urp;StarOffice.ComponentContext" % port)
+        break
+    except Exception:
+        if time.monotonic() > deadline:
+            reply(error="Não foi possível conectar ao LibreOffice headless.")
+            sys.exit(1)
+        time.sleep(0.2)
+desktop = context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+reply(ready=True)
+
+for line in sys.stdin:
+    job = json.loads(line)
+    start = time.perf_counter()
+    try:
+        document = desktop.loadComponentFromURL(uno.systemPathToFileUrl(job["docx"]),
+                                                "_blank", 0, props(Hidden=True))
+        try:
+            document.storeToURL(uno.systemPathToFileUrl(job["pdf"]),
+                                props(FilterName="writer_pdf_Export"))
+        finally:
+            document.close(True)
+        reply(seconds=time.perf_counter() - start)
+    except Exception as e:
+        reply(error=str(e))
+"""
+
+
+def find_uno_python(soffice):
+    """Python com o módulo `uno`: o que acompanha o LibreOffice ou um python3 do sistema"""
+    program_dir = os.path.dirname(os.path.realpath(soffice))
+    candidates = [os.path.join(program_dir, "python.exe" if os.name == 'nt' else "python"),
+                  os.path.join(os.path.dirname(program_dir), "Resources", "python")]  # macOS
+    candidates = [path for path in candidates if os.path.isfile(path)]
+    system_python = shutil.which("python3")
+    if system_python:
+        candidates.append(system_python)
+
+    for path in candidates:
+        try:
+            subprocess.run([path, "-c", "import uno"], stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL, timeout=30, check=True)
+            return path
+        except (OSError, subprocess.SubprocessError):
+            continue
+    return None
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _remove_partial(pdf_path):
+    """Remove o PDF deixado por uma conversão que falhou no meio da gravação"""
+    try:
+        os.remove(pdf_path)
+    except OSError:
+        pass
+
+
+def _file_url(path):
+    path = os.path.abspath(path).replace("\\", "/")
+    if not path.startswith("/"):
+        path = "/" + path
+    return "file://" + path
+
+
+class PdfConverter:
+    """
+    Conversor .docx → PDF com um LibreOffice headless reaproveitado entre os
+    documentos. O processo é iniciado no primeiro documento e encerrado em close().
+    """
+
+    def __init__(self, soffice=None):
+        self.soffice = soffice or find_soffice()
+        if not self.soffice:
+            raise FileNotFoundError("LibreOffice (soffice) não encontrado. Instale-o para exportar em PDF.")
+
+        self.uno_python = None
+        try:
+            import uno  # noqa: F401  (disponível apenas no Python do LibreOffice)
+            self.mode = "uno"
+        except ImportError:
+            self.uno_python = find_uno_python(self.soffice)
+            self.mode = "client" if self.uno_python else "batch"
+
+        # Perfil próprio: não interfere em um LibreOffice aberto pelo usuário e
+        # permanece aquecido entre as conversões
+        self.profile_dir = tempfile.mkdtemp(prefix="automatic_docs_lo_")
+        self.process = None
+        self.desktop = None
+        self.client = None
+        self.jobs = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="pdf-export", daemon=True)
+        self.thread.start()
+
+    def submit(self, docx_path, output_dir=None):
+        """
+        Enfileira a conversão de um .docx. O Future resulta em (caminho do PDF,
+        segundos gastos na conversão deste documento).
+        """
+        future = Future()
+        self.jobs.put((docx_path, output_dir or os.path.dirname(os.path.abspath(docx_path)), future))
+        return future
+
+    def close(self, cancel=False):
+        """
+        Encerra a thread de conversão e o LibreOffice. Por padrão espera a fila
+        esvaziar; com cancel=True os documentos ainda na fila são cancelados (seus
+        Futures ficam cancelados) e só a conversão em andamento é concluída. O
+        LibreOffice nunca é encerrado no meio de uma gravação, para não deixar PDFs
+        truncados.
+        """
+        if cancel:
+            while True:
+                try:
+                    job = self.jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is not None:
+                    job[2].cancel()
+        self.jobs.put(None)
+        self.thread.join()
+        if self.client is not None:
+            try:
+                self.client.stdin.close()
+                self.client.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                self.client.kill()
+        if self.desktop is not None:
+            try:
+                self.desktop.terminate()
+            except Exception:
+                pass
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+    def _base_command(self):
+        return [self.soffice, f"-env:UserInstallation={_file_url(self.profile_dir)}",
+                "--headless", "--invisible", "--nologo", "--norestore", "--nodefault"]
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+
+            # Agrupar o que já estiver na fila (nos modos UNO, um documento por vez)
+            batch = [job]
+            stop = False
+            while self.mode == "batch" and len(batch) < BATCH_SIZE:
+                try:
+                    job = self.jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    stop = True
+                    break
+                batch.append(job)
+
+            jobs = [j for j in batch if j[2].set_running_or_notify_cancel()]
+            try:
+                if self.mode in ("uno", "client"):
+                    convert = self._convert_uno if self.mode == "uno" else self._convert_client
+                    for docx_path, output_dir, future in jobs:
+                        try:
+                            future.set_result(convert(docx_path, output_dir))
+                        except Exception as e:
+                            future.set_exception(e)
+                elif jobs:
+                    self._convert_batch(jobs)
+            except Exception as e:
+                for _, _, future in jobs:
+                    if not future.done():
+                        future.set_exception(e)
+
+            if stop:
+                return
+
+    # Modos UNO: um único soffice escutando em um socket local
+    def _start_listener(self):
+        port = _free_port()
+        self.process = subprocess.Popen(
+            self._base_command() + [f"--accept=socket,host=127.0.0.1,port={port};urp;"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return port
+
+    def _connect_uno(self):
+        import uno
+
+        port = self._start_listener()
+
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local_context)
+        deadline = time.monotonic() + UNO_CONNECT_TIMEOUT
+        while True:
+            try:
+                context = resolver.resolve(
+                    f"uno:socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext")
+                break
+            except Exception:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("Não foi possível conectar ao LibreOffice headless.")
+                time.sleep(0.2)
+
+        self.desktop = context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+
+    def _convert_uno(self, docx_path, output_dir):
+        import uno
+        from com.sun.star.beans import PropertyValue
+
+        def props(**kwargs):
+            result = []
+            for name, value in kwargs.items():
+                prop = PropertyValue()
+                prop.Name = name
+                prop.Value = value
+                result.append(prop)
+            return tuple(result)
+
+        if self.desktop is None:
+            self._connect_uno()
+
+        start = time.perf_counter()
+        pdf_path = os.path.join(output_dir, os.path.splitext(os.path.basename(docx_path))[0] + ".pdf")
+        document = self.desktop.loadComponentFromURL(uno.systemPathToFileUrl(os.path.abspath(docx_path)),
+                                                     "_blank", 0, props(Hidden=True))
+        try:
+            document.storeToURL(uno.systemPathToFileUrl(os.path.abspath(pdf_path)),
+                                props(FilterName="writer_pdf_Export"))
+        except Exception:
+            _remove_partial(pdf_path)
+            raise
+        finally:
+            document.close(True)
+        return pdf_path, time.perf_counter() - start
+
+    def _start_client(self):
+        port = self._start_listener()
+        env = dict(os.environ, PYTHONIOENCODING="utf-8")
+        self.client = subprocess.Popen(
+            [self.uno_python, "-c", _UNO_CLIENT, str(port), str(UNO_CONNECT_TIMEOUT)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, encoding="utf-8", env=env)
+        reply = self._client_reply()
+        if not reply.get("ready"):
+            raise RuntimeError(reply.get("error", "Falha ao iniciar o cliente UNO do LibreOffice."))
+
+    def _client_reply(self):
+        line = self.client.stdout.readline()
+        if not line:
+            raise RuntimeError("O cliente UNO do LibreOffice foi encerrado.")
+        return json.loads(line)
+
+    def _convert_client(self, docx_path, output_dir):
+        if self.client is None or self.client.poll() is not None:
+            self._start_client()
+
+        pdf_path = os.path.join(output_dir, os.path.splitext(os.path.basename(docx_path))[0] + ".pdf")
+        self.client.stdin.write(json.dumps({"docx": os.path.abspath(docx_path),
+                                            "pdf": os.path.abspath(pdf_path)}) + "\n")
+        self.client.stdin.flush()
+        try:
+            reply = self._client_reply()
+        except Exception:
+            _remove_partial(pdf_path)
+            raise
+        if "error" in reply:
+            _remove_partial(pdf_path)
+            raise RuntimeError(f"Falha ao converter para PDF: {reply['error']}")
+        return pdf_path, reply["seconds"]
+
+    # Modo sem UNO: vários documentos por chamada do soffice (um processo por grupo)
+    def _convert_batch(self, jobs):
+        # O soffice grava todos os PDFs de uma chamada no mesmo --outdir
+        by_dir = {}
+        for job in jobs:
+            by_dir.setdefault(job[1], []).append(job)
+
+        for output_dir, dir_jobs in by_dir.items():
+            # PDFs antigos de mesmo nome esconderiam uma conversão que falhou
+            for docx_path, _, _ in dir_jobs:
+                pdf_path = os.path.join(output_dir, os.path.splitext(os.path.basename(docx_path))[0] + ".pdf")
+                if os.path.exists(pdf_path):
+                    os.remove(pdf_path)
+
+            start = time.perf_counter()
+            result = subprocess.run(
+                self._base_command() + ["--convert-to", "pdf", "--outdir", output_dir]
+                + [os.path.abspath(docx_path) for docx_path, _, _ in dir_jobs],
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+            # Tempo da chamada dividido entre os documentos convertidos juntos
+            elapsed = (time.perf_counter() - start) / len(dir_jobs)
+
+            for docx_path, _, future in dir_jobs:
+                pdf_path = os.path.join(output_dir, os.path.splitext(os.path.basename(docx_path))[0] + ".pdf")
+                if os.path.exists(pdf_path):
+                    future.set_result((pdf_path, elapsed))
+                else:
+                    detalhe = result.stdout.strip().splitlines()[-1:] or [f"código {result.returncode}"]
+                    future.set_exception(RuntimeError(f"Falha ao converter para PDF: {detalhe[0]}"))
@@ -0,0 +1,155 @@
+"""
+Testes do detector de anomalias do notebook AnomalyDetector.ipynb.
+
+O código do detector vive na célula do notebook que define PaySmartAnomalyDetector;
+a célula é executada como um módulo (sem rodar main()) e os testes usam um modelo
+pequeno treinado com dados sintéticos.
+"""
+import copy
+import json
+import os
+import sys
+import types
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("sklearn")
+pytest.importorskip("matplotlib")
+pytest.importorskip("seaborn")
+pytest.importorskip("joblib")
+
+CAMINHO_NOTEBOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "AnomalyDetector.ipynb")
+
+
+def carregar_notebook():
+    """Executa a célula com o detector como o módulo 'anomaly_detector'"""
+    with open(CAMINHO_NOTEBOOK, encoding="utf-8") as f:
+        notebook = json.load(f)
+    fonte = next("".join(celula["source"]) for celula in notebook["cells"]
+                 if celula["cell_type"] == "code" and "class PaySmartAnomalyDetector" in "".join(celula["source"]))
+
+    modulo = types.ModuleType("anomaly_detector")
+    modulo.__file__ = CAMINHO_NOTEBOOK
+    sys.modules[modulo.__name__] = modulo
+    exec(compile(fonte, CAMINHO_NOTEBOOK, "exec"), modulo.__dict__)
+    return modulo
+
+
+def transacoes_sinteticas(n, inicio="2024-01-01", semente=0):
+    rng = np.random.default_rng(semente)
+    return pd.DataFrame({
+        'id_transacao': np.arange(1, n + 1),
+        'valor_transacao': rng.exponential(100, n),
+        'tipo_estabelecimento': rng.choice(['RETAIL', 'ECOMMERCE', 'RESTAURANTE', 'POSTO', 'FARMACIA'], n),
+        'categoria_mcc': rng.choice(['5411', '5812', '5541', '5912', '4111'], n),
+        'bandeira': rng.choice(['VISA', 'MASTERCARD', 'ELO', 'AMEX'], n),
+        'tipo_transacao': rng.choice(['CREDITO', 'DEBITO', 'PIX'], n),
+        'data_transacao': pd.date_range(inicio, periods=n, freq='30min'),
+        'id_estabelecimento': rng.integers(1, 50, n),
+        'taxa_esperada': rng.uniform(1.5, 4.5, n),
+        'taxa_cobrada': rng.uniform(1.0, 5.0, n),
+        'isento': rng.choice([True, False], n, p=[0.15, 0.85]),
+        'volume_mensal_estabelecimento': rng.exponential(50000, n),
+    })
+
+
+@pytest.fixture(scope="module")
+def modulo():
+    return carregar_notebook()
+
+
+@pytest.fixture(scope="module")
+def detector_treinado(modulo):
+    detector = modulo.PaySmartAnomalyDetector()
+    detector.definir_regras_negocio()
+    df = transacoes_sinteticas(1500)
+    detector.agregados_estabelecimento.atualizar(df)
+    detector.treinar_isolation_forest(detector.preparar_dados_ml(detector.aplicar_feature_engineering(df)))
+    return detector
+
+
+@pytest.fixture
+def lote(modulo):
+    df = transacoes_sinteticas(6, inicio="2024-03-01", semente=1)
+    return df[modulo.PaySmartAnomalyDetector.CAMPOS_OBRIGATORIOS].to_dict('records')
+
+
+def resultados_um_a_um(detector, transacoes):
+    detector = copy.deepcopy(detector)
+    return [detector.monitoramento_tempo_real(transacao) for transacao in transacoes]
+
+
+@pytest.mark.parametrize("campo, valor", [
+    ('data_transacao', 'não é uma data'),
+    ('data_transacao', None),
+    ('valor_transacao', 'abc'),
+])
+def test_lote_isola_transacao_invalida(detector_treinado, lote, campo, valor):
+    lote[2] = dict(lote[2], **{campo: valor})
+    validas = [transacao for posicao, transacao in enumerate(lote) if posicao != 2]
+    esperados = resultados_um_a_um(detector_treinado, validas)
+
+    resultados = copy.deepcopy(detector_treinado).monitoramento_tempo_real_lote(lote)
+
+    assert resultados[2]['status'] == 'ERRO'
+    assert resultados[2]['id_transacao'] == lote[2]['id_transacao']
+    obtidos = [resultado for posicao, resultado in enumerate(resultados) if posicao != 2]
+    assert [r['status'] for r in obtidos] == ['SUCESSO'] * len(validas)
+    for obtido, esperado in zip(obtidos, esperados):
+        assert obtido['score_ml'] == pytest.approx(esperado['score_ml'])
+        assert obtido['score_risco'] == pytest.approx(esperado['score_risco'])
+        assert obtido['anomalias_regras'] == esperado['anomalias_regras']
+
+
+def test_lote_igual_a_chamadas_individuais(detector_treinado, lote):
+    esperados = resultados_um_a_um(detector_treinado, lote)
+    resultados = copy.deepcopy(detector_treinado).monitoramento_tempo_real_lote(lote)
+
+    assert [r['status'] for r in resultados] == ['SUCESSO'] * len(lote)
+    for obtido, esperado in zip(resultados, esperados):
+        assert obtido['score_ml'] == pytest.approx(esperado['score_ml'])
+        assert obtido['score_risco'] == pytest.approx(esperado['score_risco'])
+
+
+def test_floresta_mapeada_igual_ao_isolation_forest(modulo):
+    from sklearn.ensemble import IsolationForest
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 6))
+    novos = rng.normal(size=(500, 6))
+    floresta = IsolationForest(n_estimators=30, max_features=0.5, random_state=1).fit(X)
+    mapeada = modulo.FlorestaMapeada(floresta, tamanho_bloco=128)
+
+    assert np.array_equal(mapeada.decision_function(novos), floresta.decision_function(novos))
+    assert np.array_equal(mapeada.predict(novos), floresta.predict(novos))
+    assert np.array_equal(mapeada.isolation_forest().decision_function(novos), floresta.decision_function(novos))
+
+
+def test_pacote_mapeia_arvores_em_memoria(modulo, detector_treinado, lote, tmp_path):
+    caminho = str(tmp_path / "modelo.joblib")
+    detector_treinado.salvar_modelo(caminho)
+    carregado = modulo.PaySmartAnomalyDetector()
+    carregado.carregar_modelo(caminho)
+
+    assert isinstance(carregado.isolation_forest.limiar, np.memmap)
+    assert isinstance(carregado.isolation_forest.comprimento, np.memmap)
+    esperados = copy.deepcopy(detector_treinado).monitoramento_tempo_real_lote(lote)
+    for obtido, esperado in zip(carregado.monitoramento_tempo_real_lote(lote), esperados):
+        assert obtido['score_ml'] == esperado['score_ml']
+
+
+def test_retreino_nao_duplica_transacoes_reenviadas(detector_treinado):
+    detector = copy.deepcopy(detector_treinado)
+    novas = transacoes_sinteticas(200, inicio="2024-02-01", semente=2)
+
+    tamanhos = []
+    for _ in range(3):
+        detector.retreinar_janela(novas, arvores_por_retreino=5, max_arvores=20)
+        tamanhos.append(len(detector.janela_treino))
+        floresta = detector.isolation_forest
+        assert len(floresta._seeds) == len(floresta.estimators_) == 20
+
+    assert tamanhos == [200, 200, 200]
+    assert detector.janela_treino['id_transacao'].is_unique
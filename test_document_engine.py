@@ -0,0 +1,183 @@
+"""
+Testes do motor de preenchimento (document_engine) com os modelos de templates/
+e os campos de config/.
+"""
+import glob
+import json
+import os
+import random
+import shutil
+import zipfile
+
+import pytest
+
+pytest.importorskip("docx")
+etree = pytest.importorskip("lxml.etree")
+
+import document_engine  # noqa: E402
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+MODELOS = sorted(glob.glob(os.path.join(RAIZ, "templates", "*.docx")))
+W = "{%s}" % document_engine.W_NS
+
+
+def valores_de_teste():
+    """Um valor distinto para cada placeholder dos modelos JSON"""
+    valores = {}
+    for caminho in glob.glob(os.path.join(RAIZ, "config", "*_modelo.json")):
+        with open(caminho, encoding="utf-8") as f:
+            for chave in json.load(f)["campos"]:
+                valores[chave] = f"«{chave[1:-1].upper()}»"
+    return valores
+
+
+def conteudo_visivel(caminho):
+    """Por parte de texto: cada parágrafo como a lista de (caractere, formatação da run)"""
+    partes = {}
+    with zipfile.ZipFile(caminho) as pacote:
+        for nome in pacote.namelist():
+            if not (nome.startswith("word/") and nome.endswith(".xml")) or "_rels" in nome:
+                continue
+            raiz = etree.fromstring(pacote.read(nome))
+            if raiz.find(f".//{W}p") is None:
+                continue
+            paragrafos = []
+            for p in raiz.iter(document_engine.W_P):
+                caracteres = []
+                for run in document_engine.paragraph_runs(p):
+                    rpr = run.find(document_engine.W_RPR)
+                    formato = etree.tostring(rpr, method="c14n") if rpr is not None else b""
+                    caracteres += [(c, formato) for c in "".join(t.text or "" for t in run.iter(document_engine.W_T))]
+                paragrafos.append(caracteres)
+            partes[nome] = paragrafos
+    return partes
+
+
+def substituir_como_antes(paragrafo, antigo, novo):
+    """
+    Algoritmo anterior ao motor atual (replace_text_preserve_formatting): um
+    placeholder por chamada, com o novo texto na primeira run afetada
+    """
+    runs = paragrafo.runs
+    inicios, posicao = [], 0
+    for run in runs:
+        inicios.append(posicao)
+        posicao += len(run.text)
+    texto = "".join(run.text for run in runs)
+    ocorrencias, inicio = [], texto.find(antigo)
+    while inicio != -1:
+        ocorrencias.append((inicio, inicio + len(antigo)))
+        inicio = texto.find(antigo, inicio + len(antigo))
+
+    for inicio, fim in reversed(ocorrencias):
+        afetadas = [i for i, run in enumerate(runs)
+                    if inicios[i] < fim and inicios[i] + len(run.text) > inicio]
+        for i in afetadas:
+            atual = runs[i].text
+            parte = novo if i == afetadas[0] else ""
+            runs[i].text = atual[:max(0, inicio - inicios[i])] + parte + atual[min(len(atual), fim - inicios[i]):]
+
+
+def runs_aleatorias(documento, rng):
+    """Parágrafos com placeholders quebrados em runs de 1 a 4 caracteres, em negrito ou não"""
+    pedacos = ["foo ", "[a]", "[nome_aluno]", " [x y] ", "[zz]", "[ab]", "]", "[", "bar", "[tese/dissertação]"]
+    for _ in range(6):
+        paragrafo = documento.add_paragraph()
+        texto = "".join(rng.choice(pedacos) for _ in range(6))
+        posicao = 0
+        while posicao < len(texto):
+            tamanho = rng.randint(1, 4)
+            run = paragrafo.add_run(texto[posicao:posicao + tamanho])
+            run.bold = rng.random() < 0.3
+            if rng.random() < 0.05:
+                run.add_tab()
+            posicao += tamanho
+
+
+def formatacao_por_caractere(documento):
+    return [[(c, bool(run.bold)) for run in p.runs for c in run.text] for p in documento.paragraphs]
+
+
+def membros(caminho):
+    with zipfile.ZipFile(caminho) as pacote:
+        return {nome: pacote.read(nome) for nome in pacote.namelist()}
+
+
+@pytest.fixture
+def modelos(tmp_path):
+    """Cópias dos modelos, para que os índices .idx.json não sejam gravados em templates/"""
+    pasta = tmp_path / "templates"
+    pasta.mkdir()
+    for caminho in MODELOS:
+        shutil.copy(caminho, pasta)
+    return sorted(str(caminho) for caminho in pasta.iterdir())
+
+
+@pytest.mark.parametrize("copia_direta", [True, False], ids=["copia-direta", "writestr"])
+def test_caminho_xml_igual_ao_caminho_document(modelos, tmp_path, monkeypatch, copia_direta):
+    if not copia_direta:
+        monkeypatch.setattr(document_engine, "_can_copy_zip_member_raw", lambda *args: False)
+    valores = valores_de_teste()
+
+    for modelo in modelos:
+        nome = os.path.basename(modelo)
+        esperado = str(tmp_path / f"document_{nome}")
+        obtido = str(tmp_path / f"xml_{nome}")
+        document_engine.generate_document(modelo, valores, esperado)
+        document_engine.stream_generate_document(modelo, valores, obtido)
+
+        with zipfile.ZipFile(obtido) as pacote:
+            assert pacote.testzip() is None
+        conteudo = conteudo_visivel(obtido)
+        assert conteudo == conteudo_visivel(esperado), nome
+        texto = "".join(c for paragrafos in conteudo.values() for p in paragrafos for c, _ in p)
+        assert any(valor in texto for valor in valores.values()), nome
+
+
+def test_copia_direta_igual_a_writestr(modelos, tmp_path, monkeypatch):
+    valores = valores_de_teste()
+    for modelo in modelos:
+        direta = str(tmp_path / "direta.docx")
+        document_engine.stream_generate_document(modelo, valores, direta)
+        with monkeypatch.context() as contexto:
+            contexto.setattr(document_engine, "_can_copy_zip_member_raw", lambda *args: False)
+            recompactada = str(tmp_path / "recompactada.docx")
+            document_engine.stream_generate_document(modelo, valores, recompactada)
+        assert membros(direta) == membros(recompactada), os.path.basename(modelo)
+
+
+def test_runs_quebradas_iguais_ao_algoritmo_anterior(tmp_path):
+    """
+    Placeholders quebrados em runs aleatórias: o motor atual (uma passada por
+    parágrafo, direto e por generate_document) produz o mesmo texto e formatação
+    que o algoritmo anterior. Os valores não contêm nem podem formar texto de
+    placeholder (não vazios, sem letras nem colchetes), o único caso em que as
+    substituições em sequência do algoritmo anterior diferem de propósito.
+    """
+    Document = document_engine._docx().Document
+    chaves = ["[a]", "[nome_aluno]", "[x y]", "[tese/dissertação]", "[ab]"]
+    rng = random.Random(1)
+
+    for tentativa in range(60):
+        documento = Document()
+        runs_aleatorias(documento, rng)
+        modelo = str(tmp_path / f"modelo{tentativa}.docx")
+        documento.save(modelo)
+        valores = {chave: rng.choice(["1", "22 333", "4\t5", "6" * 40])
+                   for chave in rng.sample(chaves, rng.randint(1, len(chaves)))}
+
+        esperado = Document(modelo)
+        for paragrafo in esperado.paragraphs:
+            for chave, valor in valores.items():
+                substituir_como_antes(paragrafo, chave, valor)
+
+        direto = Document(modelo)
+        padrao = document_engine.compile_placeholder_pattern(valores)
+        for paragrafo in direto.paragraphs:
+            document_engine.replace_placeholders_preserve_formatting(paragrafo.runs, padrao, valores)
+        assert [[r.text for r in p.runs] for p in direto.paragraphs] == \
+            [[r.text for r in p.runs] for p in esperado.paragraphs], valores
+
+        gerado = str(tmp_path / "gerado.docx")
+        document_engine.generate_document(modelo, valores, gerado)
+        assert formatacao_por_caractere(Document(gerado)) == formatacao_por_caractere(esperado), valores